@@ -0,0 +1,421 @@
+from pathlib import Path
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import uuid
+
+from alias_history import make_delta
+
+# --- ALIAS DAEMON ---
+# An optional long-running process that owns the alias state and settings.json.
+# Clients talk newline-delimited JSON over a UNIX socket:
+#
+#   -> {"id": 1, "op": "set", "key": "ls", "value": "ls -la", "client": "ab12"}
+#   <- {"id": 1, "ok": true, "version": 8, "result": null}
+#
+# Ops: ping, get, set, delete, apply, dump, search, subscribe, flush, shutdown.
+# After "subscribe" the connection also receives change events:
+#
+#   <- {"event": "changed", "version": 9, "keys": ["ls"], "client": "ab12"}
+#
+# Writes name the keys they touch, so two clients editing different aliases
+# never overwrite each other; "apply" can also insist on an expected version.
+# A write is answered once it is on disk (or failed, with code "write_failed"),
+# and subscribers hear of it only after it was saved.
+
+SOCKET_ENV = 'TOWER_ALIAS_SOCKET'
+NO_DAEMON_ENV = 'TOWER_ALIAS_NO_DAEMON'
+SOCKET_NAME = 'tower-alias-manager.sock'
+REQUEST_TIMEOUT = 30
+CONNECT_TIMEOUT = 2  # for the first ping; a daemon that is stuck is treated as absent
+
+
+class DaemonError(Exception):
+    def __init__(self, message: str, code: str = 'error'):
+        super().__init__(message)
+        self.code = code
+
+
+def socket_path():
+    """$TOWER_ALIAS_SOCKET, else a per-user path under $XDG_RUNTIME_DIR or the temp dir."""
+    if os.environ.get(SOCKET_ENV):
+        return Path(os.environ[SOCKET_ENV])
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime:
+        return Path(runtime) / SOCKET_NAME
+    return Path(tempfile.gettempdir()) / f"{Path(SOCKET_NAME).stem}-{os.getuid()}.sock"
+
+
+def _encode(message: dict):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+# --- SERVER ---
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+
+    def send(self, message: dict):
+        with self.write_lock:
+            self.wfile.write(_encode(message))
+            self.wfile.flush()
+
+    def handle(self):
+        daemon = self.server.daemon
+        try:
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError
+                except ValueError:
+                    self.send({'id': None, 'ok': False, 'error': "Malformed request.", 'code': 'bad_request'})
+                    continue
+                response = daemon.handle(request, self)
+                self.send(response)
+                if request.get('op') == 'subscribe' and response['ok']:
+                    # Only now, so no event can reach the client ahead of the acknowledgement
+                    daemon.subscribe(self)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            daemon.unsubscribe(self)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class AliasDaemon:
+    """Owns the in-memory aliases and serves them over a UNIX socket.
+
+    Writes go through the usual SettingsWriter (coalesced, atomic, recorded in
+    the history); outside changes to settings.json are picked up by a
+    SettingsWatcher and pushed to subscribers.
+    """
+
+    def __init__(self, path: Path = None, cache=None, writer=None):
+        from alias_search import AliasIndex
+        from settings_io import settings_cache, settings_writer
+
+        self.path = path or socket_path()
+        self.cache = cache or settings_cache
+        self.writer = writer or settings_writer
+        self.lock = threading.RLock()
+        self.subscribers = set()
+        self.version = 0
+        self.aliases = None
+        self.index = AliasIndex()
+        self.server = None
+        self.watcher = None
+        self.ops = {
+            'ping': self.op_ping, 'get': self.op_get, 'set': self.op_set, 'delete': self.op_delete,
+            'apply': self.op_apply, 'dump': self.op_dump, 'search': self.op_search,
+            'subscribe': self.op_subscribe, 'flush': self.op_flush, 'shutdown': self.op_shutdown,
+        }
+        self.load()
+
+    def load(self):
+        """(Re)reads settings.json; returns the keys that changed."""
+        with self.lock:
+            try:
+                aliases = self.cache.get_aliases()
+            except (OSError, ValueError):
+                aliases = None
+            old = self.aliases or {}
+            new = aliases or {}
+            delta = make_delta(old, new)
+            self.aliases = aliases
+            self.index.build(new)
+            self.version += 1
+            return sorted(set(delta['set']) | set(delta['del']))
+
+    # --- Serving ---
+
+    def bind(self):
+        """Creates the socket and starts watching settings.json."""
+        if self.path.exists():
+            if connect_daemon(self.path) is not None:
+                raise DaemonError(f"A daemon is already listening on {self.path}.", 'running')
+            self.path.unlink(missing_ok=True)  # Stale socket from a daemon that died
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        from settings_io import SettingsWatcher
+        old_umask = os.umask(0o177)  # Socket is for this user only
+        try:
+            self.server = _Server(str(self.path), _Handler)
+        finally:
+            os.umask(old_umask)
+        self.server.daemon = self
+        self.watcher = SettingsWatcher(self._changed_on_disk, self.cache)
+        self.watcher.start()
+
+    def serve_forever(self):
+        if self.server is None:
+            self.bind()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.watcher.stop()
+            self.server.server_close()
+            self.path.unlink(missing_ok=True)
+            self.writer.flush()
+
+    def _changed_on_disk(self):
+        keys = self.load()
+        if keys:
+            self.notify(keys, None)
+
+    def handle(self, request: dict, conn):
+        request_id = request.get('id')
+        op = self.ops.get(request.get('op'))
+        if op is None:
+            return {'id': request_id, 'ok': False, 'error': f"Unknown op '{request.get('op')}'.", 'code': 'bad_request'}
+        try:
+            result = op(request, conn)
+        except DaemonError as e:
+            return {'id': request_id, 'ok': False, 'error': str(e), 'code': e.code, 'version': self.version}
+        except (KeyError, TypeError, ValueError) as e:
+            return {'id': request_id, 'ok': False, 'error': f"Bad request: {e}", 'code': 'bad_request'}
+        return {'id': request_id, 'ok': True, 'version': self.version, 'result': result}
+
+    def notify(self, keys, client):
+        event = {'event': 'changed', 'version': self.version, 'keys': keys, 'client': client}
+        for conn in list(self.subscribers):
+            try:
+                conn.send(event)
+            except OSError:
+                self.unsubscribe(conn)
+
+    def subscribe(self, conn):
+        self.subscribers.add(conn)
+
+    def unsubscribe(self, conn):
+        self.subscribers.discard(conn)
+
+    def _require_settings(self):
+        if self.aliases is None:
+            raise DaemonError("Settings file not found. Have you run the game yet?", 'no_settings')
+        return self.aliases
+
+    # --- Ops ---
+
+    def op_ping(self, request, conn):
+        return {'pid': os.getpid(), 'aliases': len(self.aliases or {}), 'settings': str(self.cache.path)}
+
+    def op_get(self, request, conn):
+        with self.lock:
+            aliases = self._require_settings()
+            if 'key' not in request:
+                return dict(aliases)
+            if request['key'] not in aliases:
+                raise DaemonError(f"No alias named '{request['key']}'.", 'not_found')
+            return aliases[request['key']]
+
+    def op_set(self, request, conn):
+        return self._apply({str(request['key']): str(request['value'])}, (), request)
+
+    def op_delete(self, request, conn):
+        return self._apply({}, (str(request['key']),), request)
+
+    def op_apply(self, request, conn):
+        updates = {str(k): str(v) for k, v in (request.get('set') or {}).items()}
+        return self._apply(updates, [str(k) for k in request.get('delete') or ()], request)
+
+    def _apply(self, updates: dict, deletes, request):
+        """Applies one atomic change, waits for it to be written and tells subscribers.
+
+        If the write fails, the aliases are reloaded from disk so the daemon
+        never serves a change that wasn't saved.
+        """
+        with self.lock:
+            aliases = self._require_settings()
+            expected = request.get('expect_version')
+            if expected is not None and expected != self.version:
+                raise DaemonError(f"Aliases changed since version {expected} (now {self.version}).", 'conflict')
+
+            if request.get('replace'):
+                deletes = [key for key in aliases if key not in updates]
+            changed = [key for key, value in updates.items() if aliases.get(key) != value]
+            removed = [key for key in deletes if key in aliases]
+            if not changed and not removed:
+                return {'changed': 0}
+
+            for key in removed:
+                del aliases[key]
+                self.index.remove(key)
+            for key in changed:
+                aliases[key] = updates[key]
+                self.index.set(key, updates[key])
+            self.version += 1
+            result = []
+            done = threading.Event()
+
+            def on_done(*r):
+                result.append(r)
+                done.set()
+            self.writer.submit(aliases, on_done, request.get('label') or "Edit via daemon")
+            keys = sorted(set(changed) | set(removed))
+
+        if request.get('wait'):
+            self.writer.flush()  # Skip the coalesce delay
+        done.wait()
+        success, message = result[0]
+        if not success:
+            reverted = self.load()
+            if reverted:
+                self.notify(reverted, None)
+            raise DaemonError(f"Could not write settings file: {message}", 'write_failed')
+        self.notify(keys, request.get('client'))
+        return {'changed': len(keys), 'message': message}
+
+    def op_dump(self, request, conn):
+        from share_codec import encode_share_string
+        with self.lock:
+            aliases = dict(self._require_settings())
+        return aliases if request.get('plain') else encode_share_string(aliases)
+
+    def op_search(self, request, conn):
+        with self.lock:
+            self._require_settings()
+            return self.index.search(str(request.get('query', '')), request.get('limit'))
+
+    def op_subscribe(self, request, conn):
+        pass  # The handler registers conn once this reply is sent
+
+    def op_flush(self, request, conn):
+        self.writer.flush()
+
+    def op_shutdown(self, request, conn):
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+def run_daemon(path: Path = None):
+    """Serves until shut down (Ctrl+C or a 'shutdown' request)."""
+    daemon = AliasDaemon(path)
+    daemon.bind()
+    print(f"Alias daemon listening on {daemon.path}")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+# --- CLIENT ---
+
+class DaemonClient:
+    """One connection to the daemon. Requests may come from any thread."""
+
+    def __init__(self, path: Path = None, timeout: float = REQUEST_TIMEOUT):
+        self.path = path or socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(str(self.path))
+        except OSError:
+            self.sock.close()
+            raise
+        self.file = self.sock.makefile('rwb')
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.client_id = uuid.uuid4().hex[:12]
+        self.base = None  # (aliases, version) as last read, for working out deltas
+
+    def close(self):
+        try:
+            self.file.close()
+        finally:
+            self.sock.close()
+
+    def request(self, op: str, **params):
+        """Sends one request; returns (result, version) or raises DaemonError / OSError."""
+        with self.lock:
+            self.next_id += 1
+            self.file.write(_encode({'id': self.next_id, 'op': op, 'client': self.client_id, **params}))
+            self.file.flush()
+            line = self.file.readline()
+        if not line:
+            raise ConnectionError("The alias daemon closed the connection.")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise DaemonError(response.get('error', "Request failed."), response.get('code', 'error'))
+        return response.get('result'), response.get('version')
+
+    def get_aliases(self):
+        """(aliases, version); raises FileNotFoundError if the daemon has no settings.json."""
+        try:
+            aliases, version = self.request('get')
+        except DaemonError as e:
+            if e.code == 'no_settings':
+                raise FileNotFoundError(str(e))
+            raise
+        self.base = (aliases, version)
+        return dict(aliases), version
+
+    def write(self, new_aliases: dict, label: str = None, base=None, check: bool = False, wait: bool = True):
+        """Sends just the keys that differ from base (default: the last read).
+
+        Returns once the daemon has written the change; wait=False lets the
+        daemon coalesce it with other edits first. With check=True the write fails with code 'conflict' if anyone else
+        changed the aliases since base was read. Returns (success, message)
+        like SettingsWriter.write_now.
+        """
+        base_aliases, base_version = base or self.base or self.get_aliases()
+        delta = make_delta(base_aliases, new_aliases)
+        try:
+            result, version = self.request('apply', set=delta['set'], delete=delta['del'], label=label, wait=wait,
+                                           expect_version=base_version if check else None)
+        except DaemonError as e:
+            if e.code == 'write_failed':
+                self.base = None  # The daemon reloaded from disk
+            return False, str(e)
+        self.base = (dict(new_aliases), version)
+        if not result['changed']:
+            return True, "No changes"
+        return True, result.get('message', "Success")
+
+    def subscribe(self, callback):
+        """Calls callback(event) from a background thread for every change; returns a client to close() to stop."""
+        listener = DaemonClient(self.path, timeout=None)
+        listener.request('subscribe')
+
+        def run():
+            try:
+                for line in listener.file:
+                    message = json.loads(line)
+                    if message.get('event'):
+                        callback(message)
+            except (OSError, ValueError):
+                pass
+
+        threading.Thread(target=run, name="DaemonEvents", daemon=True).start()
+        return listener
+
+
+def connect_daemon(path: Path = None):
+    """A DaemonClient if a daemon is listening and answers, else None (so callers fall back to the file)."""
+    if not hasattr(socket, 'AF_UNIX') or os.environ.get(NO_DAEMON_ENV, '') not in ('', '0'):
+        return None
+    path = path or socket_path()
+    if not path.exists():
+        return None
+    try:
+        client = DaemonClient(path, timeout=CONNECT_TIMEOUT)
+    except OSError:
+        return None
+    try:
+        client.request('ping')
+    except (OSError, ValueError, DaemonError):
+        client.close()
+        return None
+    client.sock.settimeout(REQUEST_TIMEOUT)
+    return client
+
+
+if __name__ == '__main__':
+    run_daemon()
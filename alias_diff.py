@@ -0,0 +1,129 @@
+from dataclasses import dataclass, field
+import hashlib
+import json
+
+# --- ALIAS DIFF & MERGE ---
+# Compares the current and incoming alias maps by per-alias content hash so an
+# import only touches what actually changes.
+
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED = 'changed'
+IDENTICAL = 'identical'
+
+# Merge policies
+REPLACE_ALL = 'replace'        # incoming map wins wholesale (the old behaviour)
+TAKE_THEIRS = 'take_theirs'    # add new keys, overwrite conflicts, keep my extra keys
+KEEP_MINE = 'keep_mine'        # add new keys only
+RENAME = 'rename'              # add new keys, import conflicts under a new name
+DEFAULT_POLICY = TAKE_THEIRS   # what every import uses unless told otherwise, in the GUI and the CLI
+
+POLICIES = {
+    REPLACE_ALL: "Replace all",
+    TAKE_THEIRS: "Take theirs",
+    KEEP_MINE: "Keep mine",
+    RENAME: "Rename on conflict",
+}
+
+
+def alias_hash(value):
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True)
+    return hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest()
+
+
+def hash_aliases(aliases: dict):
+    return {key: alias_hash(value) for key, value in aliases.items()}
+
+
+@dataclass
+class AliasDiff:
+    current: dict
+    incoming: dict
+    added: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+    identical: list = field(default_factory=list)
+
+    @property
+    def differences(self):
+        """(status, key) for every key that is not identical, sorted by key."""
+        return sorted([(ADDED, k) for k in self.added] + [(CHANGED, k) for k in self.changed] +
+                      [(REMOVED, k) for k in self.removed], key=lambda item: item[1])
+
+    def summary(self):
+        return (f"{len(self.added)} added, {len(self.changed)} changed, "
+                f"{len(self.removed)} removed, {len(self.identical)} identical")
+
+    def render(self, limit: int = None):
+        """Human readable diff of just the differences."""
+        lines = []
+        differences = self.differences
+        for status, key in differences[:limit] if limit else differences:
+            if status == ADDED:
+                lines.append(f"+ {key}: {self.incoming[key]}")
+            elif status == REMOVED:
+                lines.append(f"- {key}: {self.current[key]}")
+            else:
+                lines.append(f"~ {key}:")
+                lines.append(f"    - {self.current[key]}")
+                lines.append(f"    + {self.incoming[key]}")
+        if limit and len(differences) > limit:
+            lines.append(f"...and {len(differences) - limit} more differences")
+        return '\n'.join(lines)
+
+
+def diff_aliases(current: dict, incoming: dict):
+    """Classifies every key as added, removed, changed or identical."""
+    diff = AliasDiff(current, incoming)
+    current_hashes = hash_aliases(current)
+    for key, digest in hash_aliases(incoming).items():
+        existing = current_hashes.get(key)
+        if existing is None:
+            diff.added.append(key)
+        elif existing == digest:
+            diff.identical.append(key)
+        else:
+            diff.changed.append(key)
+    diff.removed = [key for key in current if key not in incoming]
+    return diff
+
+
+def _free_name(key: str, taken):
+    n = 2
+    while f"{key}_{n}" in taken:
+        n += 1
+    return f"{key}_{n}"
+
+
+def merge_aliases(diff: AliasDiff, policy: str = DEFAULT_POLICY, selected=None):
+    """Builds the alias map an import would write.
+
+    selected, if given, limits the import to those keys. Keys missing from the
+    incoming map are deleted under REPLACE_ALL, or when explicitly selected.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown merge policy '{policy}'.")
+
+    wanted = (lambda key: True) if selected is None else set(selected).__contains__
+    merged = dict(diff.current)
+
+    for key in diff.added:
+        if wanted(key):
+            merged[key] = diff.incoming[key]
+
+    for key in diff.changed:
+        # Ticking a conflicting key overrides KEEP_MINE for that key
+        if not wanted(key) or (policy == KEEP_MINE and selected is None):
+            continue
+        if policy == RENAME:
+            merged[_free_name(key, merged.keys() | diff.incoming.keys())] = diff.incoming[key]
+        else:
+            merged[key] = diff.incoming[key]
+
+    if policy == REPLACE_ALL or selected is not None:
+        for key in diff.removed:
+            if wanted(key):
+                del merged[key]
+
+    return merged
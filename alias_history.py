@@ -0,0 +1,213 @@
+from bisect import bisect_left
+from pathlib import Path
+import json
+import re
+import threading
+import time
+import zlib
+
+# --- ALIAS SNAPSHOT HISTORY ---
+# Every write of cmd_alias is recorded as a delta against the version before
+# it, with a full checkpoint every CHECKPOINT_EVERY versions (or whenever a
+# delta would be nearly as big as a full copy). Restoring replays at most one
+# checkpoint plus the deltas after it.
+
+HISTORY_NAME = 'tower_alias_history.db'
+UNDO_LABEL = re.compile(r'^Undo #(\d+)$')  # label of a write made by undo_target's caller
+CHECKPOINT_EVERY = 32
+FULL = 'full'
+DELTA = 'delta'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    label TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    alias_count INTEGER NOT NULL,
+    added INTEGER NOT NULL,
+    changed INTEGER NOT NULL,
+    removed INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+"""
+
+
+_MISSING = object()
+
+
+def make_delta(old: dict, new: dict):
+    """{'set': {...}, 'del': [...]} turning old into new."""
+    changed = {k: v for k, v in new.items() if old.get(k, _MISSING) != v}
+    return {'set': changed, 'del': [k for k in old if k not in new]}
+
+
+def apply_delta(aliases: dict, delta: dict):
+    for key in delta.get('del', ()):
+        aliases.pop(key, None)
+    aliases.update(delta.get('set', {}))
+    return aliases
+
+
+def _pack(data):
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'), 6)
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+class AliasHistory:
+    """SQLite log of cmd_alias versions. Safe to use from any thread."""
+
+    def __init__(self, path: Path, checkpoint_every: int = CHECKPOINT_EVERY):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.lock = threading.Lock()
+        self.latest = None  # (id, aliases) of the newest snapshot, once known
+
+    def _connect(self):
+        import sqlite3
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.executescript(SCHEMA)
+        return conn
+
+    # --- Recording ---
+
+    def record(self, before: dict, after: dict, label: str):
+        """Records a write that changed cmd_alias from before to after.
+
+        If before isn't the newest snapshot (first run, or the game changed the
+        file since), it is recorded first so the pre-write state is restorable.
+        """
+        with self.lock:
+            conn = self._connect()
+            try:
+                latest_id, latest = self._latest(conn)
+                if latest != before and (latest is not None or before):
+                    latest_id = self._add(conn, latest, before, "Before change" if latest_id is None else "Changed outside the manager")
+                    latest = before
+                new_id = self._add(conn, latest, after, label)
+                conn.commit()
+                self.latest = (new_id, dict(after))
+            finally:
+                conn.close()
+
+    def _latest(self, conn):
+        row = conn.execute("SELECT MAX(id) FROM snapshots").fetchone()
+        latest_id = row[0]
+        if latest_id is None:
+            return None, None
+        if self.latest is None or self.latest[0] != latest_id:
+            self.latest = (latest_id, self._restore(conn, latest_id))
+        return self.latest
+
+    def _add(self, conn, previous, aliases: dict, label: str):
+        previous = previous or {}
+        delta = make_delta(previous, aliases)
+        added = sum(1 for k in delta['set'] if k not in previous)
+        counts = (added, len(delta['set']) - added, len(delta['del']))
+
+        since_checkpoint = conn.execute(
+            "SELECT COUNT(*) FROM snapshots WHERE id > COALESCE((SELECT MAX(id) FROM snapshots WHERE kind = ?), 0)",
+            (FULL,)).fetchone()[0]
+        has_checkpoint = conn.execute("SELECT 1 FROM snapshots WHERE kind = ? LIMIT 1", (FULL,)).fetchone()
+
+        kind, payload = DELTA, _pack(delta)
+        if not has_checkpoint or since_checkpoint + 1 >= self.checkpoint_every:
+            kind, payload = FULL, _pack(aliases)
+        elif len(delta['set']) + len(delta['del']) > len(aliases) // 2:
+            # A delta touching most keys is no cheaper than a checkpoint
+            full = _pack(aliases)
+            if len(full) <= len(payload):
+                kind, payload = FULL, full
+
+        cur = conn.execute(
+            "INSERT INTO snapshots (created, label, kind, alias_count, added, changed, removed, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (time.time(), label, kind, len(aliases)) + counts + (payload,))
+        return cur.lastrowid
+
+    # --- Reading ---
+
+    def list_snapshots(self, limit: int = 100):
+        """[{'id', 'created', 'label', 'kind', 'alias_count', 'added', 'changed', 'removed'}], newest first.
+
+        Only metadata is read; no snapshot is decompressed.
+        """
+        if not self.path.exists():
+            return []
+        columns = ('id', 'created', 'label', 'kind', 'alias_count', 'added', 'changed', 'removed')
+        with self.lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(f"SELECT {', '.join(columns)} FROM snapshots ORDER BY id DESC LIMIT ?",
+                                    (limit,)).fetchall()
+            finally:
+                conn.close()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def undo_target(self):
+        """(undone snapshot id, id to restore) for undoing the newest change, or None.
+
+        A snapshot labelled "Undo #N" put the aliases back to how they were
+        before N, so repeated undos keep walking back instead of redoing.
+        """
+        if not self.path.exists():
+            return None
+        with self.lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute("SELECT id, label FROM snapshots ORDER BY id").fetchall()
+            finally:
+                conn.close()
+        ids = [snapshot_id for snapshot_id, _label in rows]
+        labels = dict(rows)
+
+        def previous(snapshot_id):
+            index = bisect_left(ids, snapshot_id)
+            return ids[index - 1] if index > 0 else None
+
+        def state_of(snapshot_id):
+            # The original snapshot whose aliases snapshot_id holds
+            while snapshot_id is not None:
+                match = UNDO_LABEL.match(labels[snapshot_id])
+                if not match or int(match.group(1)) not in labels:
+                    return snapshot_id
+                snapshot_id = previous(int(match.group(1)))
+            return None
+
+        undone = state_of(ids[-1]) if ids else None
+        target = state_of(previous(undone)) if undone is not None else None
+        return None if target is None else (undone, target)
+
+    def restore(self, snapshot_id: int):
+        """The alias map as it was at snapshot_id. Raises KeyError if there is no such snapshot."""
+        with self.lock:
+            conn = self._connect()
+            try:
+                return self._restore(conn, snapshot_id)
+            finally:
+                conn.close()
+
+    def _restore(self, conn, snapshot_id: int):
+        if not conn.execute("SELECT 1 FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone():
+            raise KeyError(snapshot_id)
+        checkpoint = conn.execute("SELECT MAX(id) FROM snapshots WHERE kind = ? AND id <= ?",
+                                  (FULL, snapshot_id)).fetchone()[0]
+        rows = conn.execute("SELECT kind, payload FROM snapshots WHERE id >= ? AND id <= ? ORDER BY id",
+                            (checkpoint, snapshot_id))
+        aliases = {}
+        for kind, payload in rows:
+            if kind == FULL:
+                aliases = _unpack(payload)
+            else:
+                apply_delta(aliases, _unpack(payload))
+        return aliases
+
+
+def format_snapshot(entry: dict):
+    when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['created']))
+    return (f"#{entry['id']}  {when}  {entry['label']}  "
+            f"({entry['alias_count']} aliases: +{entry['added']} ~{entry['changed']} -{entry['removed']})")
@@ -0,0 +1,181 @@
+from bisect import bisect_left, insort
+import re
+
+# --- IN-MEMORY ALIAS SEARCH INDEX ---
+# Built once when aliases are loaded and kept up to date per edit, so a search
+# never has to rescan or re-sort the whole alias map.
+
+TOKEN_RE = re.compile(r"[^\s;<>|]+")
+WORD_SPLIT_RE = re.compile(r"[_\-.]+")
+
+# Ranking weights, best first
+SCORE_NAME_EXACT = 100
+SCORE_NAME_PREFIX = 80
+SCORE_NAME_TOKEN = 60
+SCORE_NAME_SUBSTRING = 50
+SCORE_CMD_TOKEN = 40
+SCORE_CMD_PREFIX = 30
+SCORE_CMD_SUBSTRING = 20
+
+
+def name_tokens(key: str):
+    """The '_'/'-'/'.' separated parts of a lowercased alias name."""
+    return {part for part in WORD_SPLIT_RE.split(key.lower()) if part}
+
+
+def command_tokens(value: str):
+    """Lowercased words from every ';'-separated command in an alias body."""
+    return set(TOKEN_RE.findall(value.lower()))
+
+
+class _TokenIndex:
+    """token -> keys, plus a sorted vocabulary for substring lookups."""
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+
+    def add(self, key, tokens, keep_sorted=True):
+        if not keep_sorted:
+            # Bulk load: resort() fixes up the vocabulary afterwards
+            postings = self.postings
+            for token in tokens:
+                if token in postings:
+                    postings[token].add(key)
+                else:
+                    postings[token] = {key}
+            return
+
+        for token in tokens:
+            keys = self.postings.get(token)
+            if keys is None:
+                keys = self.postings[token] = set()
+                insort(self.vocabulary, token)
+            keys.add(key)
+
+    def resort(self):
+        self.vocabulary = sorted(self.postings)
+
+    def discard(self, key, tokens):
+        for token in tokens:
+            keys = self.postings.get(token)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    def exact(self, term):
+        return self.postings.get(term, ())
+
+    def substring(self, term):
+        """Yields (token, keys) for every token containing term.
+
+        Scans the vocabulary, which is far smaller than the aliases themselves.
+        """
+        for token in self.vocabulary:
+            if term in token:
+                yield token, self.postings[token]
+
+
+class AliasIndex:
+    """Prefix, substring and token search over alias names and command bodies."""
+
+    def __init__(self, aliases: dict = None):
+        self.build(aliases or {})
+
+    def build(self, aliases: dict):
+        self.aliases = {}
+        self.sorted_keys = []
+        self._names = _TokenIndex()     # full lowercased names
+        self._parts = _TokenIndex()     # name parts
+        self._commands = _TokenIndex()  # command words
+        self._tokens = {}  # key -> (name parts, command tokens)
+
+        for key, value in aliases.items():
+            self._add(key, value, keep_sorted=False)
+        self.sorted_keys = sorted(self.aliases)
+        for index in (self._names, self._parts, self._commands):
+            index.resort()
+
+    def set(self, key: str, value: str):
+        """Adds or updates one alias."""
+        if key in self.aliases:
+            self._remove(key)
+        else:
+            insort(self.sorted_keys, key)
+        self._add(key, value)
+
+    def remove(self, key: str):
+        if key not in self.aliases:
+            return
+        self._remove(key)
+        del self.sorted_keys[bisect_left(self.sorted_keys, key)]
+
+    def _add(self, key, value, keep_sorted=True):
+        tokens = (name_tokens(key), command_tokens(value or ""))
+        self.aliases[key] = value
+        self._tokens[key] = tokens
+        self._names.add(key, (key.lower(),), keep_sorted)
+        self._parts.add(key, tokens[0], keep_sorted)
+        self._commands.add(key, tokens[1], keep_sorted)
+
+    def _remove(self, key):
+        parts, commands = self._tokens.pop(key)
+        del self.aliases[key]
+        self._names.discard(key, (key.lower(),))
+        self._parts.discard(key, parts)
+        self._commands.discard(key, commands)
+
+    def _score_term(self, term):
+        """key -> best score for a single query term."""
+        scores = {}
+
+        def bump(keys, score):
+            for key in keys:
+                if scores.get(key, 0) < score:
+                    scores[key] = score
+
+        for token, keys in self._commands.substring(term):
+            if token == term:
+                bump(keys, SCORE_CMD_TOKEN)
+            else:
+                bump(keys, SCORE_CMD_PREFIX if token.startswith(term) else SCORE_CMD_SUBSTRING)
+        bump(self._parts.exact(term), SCORE_NAME_TOKEN)
+        for name, keys in self._names.substring(term):
+            if name == term:
+                bump(keys, SCORE_NAME_EXACT)
+            else:
+                bump(keys, SCORE_NAME_PREFIX if name.startswith(term) else SCORE_NAME_SUBSTRING)
+        return scores
+
+    def search(self, query: str, limit: int = None):
+        """Returns matching keys, best match first.
+
+        Every whitespace-separated term must match the alias name or one of its
+        commands; an empty query returns all keys in sorted order.
+        """
+        terms = query.lower().split()
+        if not terms:
+            return self.sorted_keys[:limit] if limit else list(self.sorted_keys)
+
+        totals = None
+        for term in terms:
+            scores = self._score_term(term)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {key: totals[key] + score for key, score in scores.items() if key in totals}
+            if not totals:
+                return []
+
+        # Bucket by score rather than sorting on (score, key) tuples; big result
+        # sets would otherwise allocate a tuple per match.
+        buckets = {}
+        for key, score in totals.items():
+            buckets.setdefault(score, []).append(key)
+        ranked = []
+        for score in sorted(buckets, reverse=True):
+            ranked.extend(sorted(buckets[score]))
+        return ranked[:limit] if limit else ranked
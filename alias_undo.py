@@ -0,0 +1,284 @@
+# --- UNDO / REDO ---
+# Each version of the alias map is a PersistentMap: a hash array mapped trie
+# with 32-way nodes. Changing one key copies only the nodes on its path (four
+# or so for 100,000 aliases) and shares the rest with the previous version,
+# so keeping every version costs memory per edit, not per edit per alias.
+
+UNDO_LIMIT = 1000  # versions kept; the oldest edits are forgotten first
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASH_MASK = (1 << 64) - 1
+
+DELETED = object()  # value of a key an undo or redo removes
+
+
+class _Node:
+    """Interior node: bitmap of occupied slots, and one child per set bit."""
+    __slots__ = ('bitmap', 'children')
+
+    def __init__(self, bitmap, children):
+        self.bitmap = bitmap
+        self.children = children
+
+
+class _Collision:
+    """Keys whose 64-bit hashes are identical."""
+    __slots__ = ('hash', 'pairs')
+
+    def __init__(self, hash_value, pairs):
+        self.hash = hash_value
+        self.pairs = pairs
+
+
+# Leaves are plain (hash, key, value) tuples.
+
+def _hash(key):
+    return hash(key) & _HASH_MASK
+
+
+def _slot(bitmap, bit):
+    return (bitmap & (bit - 1)).bit_count()
+
+
+def _entry_hash(entry):
+    return entry.hash if isinstance(entry, _Collision) else entry[0]
+
+
+def _entry_pairs(entry):
+    return entry.pairs if isinstance(entry, _Collision) else ((entry[1], entry[2]),)
+
+
+def _merge(a, b, shift):
+    """A subtree holding the two leaves (or collision buckets) a and b."""
+    hash_a, hash_b = _entry_hash(a), _entry_hash(b)
+    if hash_a == hash_b:
+        return _Collision(hash_a, _entry_pairs(a) + _entry_pairs(b))
+    index_a, index_b = (hash_a >> shift) & _MASK, (hash_b >> shift) & _MASK
+    if index_a == index_b:
+        return _Node(1 << index_a, (_merge(a, b, shift + _BITS),))
+    children = (a, b) if index_a < index_b else (b, a)
+    return _Node((1 << index_a) | (1 << index_b), children)
+
+
+def _get(node, h, key, default):
+    shift = 0
+    while True:
+        if isinstance(node, _Node):
+            bit = 1 << ((h >> shift) & _MASK)
+            if not node.bitmap & bit:
+                return default
+            node = node.children[_slot(node.bitmap, bit)]
+            shift += _BITS
+        elif isinstance(node, _Collision):
+            for k, v in node.pairs:
+                if k == key:
+                    return v
+            return default
+        else:
+            return node[2] if node[0] == h and node[1] == key else default
+
+
+def _set(node, h, key, value, shift):
+    """(new subtree, whether key was added). Returns node itself if nothing changed."""
+    if isinstance(node, _Node):
+        bit = 1 << ((h >> shift) & _MASK)
+        index = _slot(node.bitmap, bit)
+        children = node.children
+        if not node.bitmap & bit:
+            return _Node(node.bitmap | bit, children[:index] + ((h, key, value),) + children[index:]), True
+        child, added = _set(children[index], h, key, value, shift + _BITS)
+        if child is children[index]:
+            return node, False
+        return _Node(node.bitmap, children[:index] + (child,) + children[index + 1:]), added
+    if isinstance(node, _Collision):
+        if node.hash != h:
+            return _merge(node, (h, key, value), shift), True
+        for i, (k, v) in enumerate(node.pairs):
+            if k == key:
+                if v == value:
+                    return node, False
+                return _Collision(h, node.pairs[:i] + ((key, value),) + node.pairs[i + 1:]), False
+        return _Collision(h, node.pairs + ((key, value),)), True
+    if node[0] == h and node[1] == key:
+        return (node, False) if node[2] == value else ((h, key, value), False)
+    return _merge(node, (h, key, value), shift), True
+
+
+def _delete(node, h, key, shift):
+    """(new subtree or None if empty, whether key was removed)."""
+    if isinstance(node, _Node):
+        bit = 1 << ((h >> shift) & _MASK)
+        if not node.bitmap & bit:
+            return node, False
+        index = _slot(node.bitmap, bit)
+        children = node.children
+        child, removed = _delete(children[index], h, key, shift + _BITS)
+        if not removed:
+            return node, False
+        if child is None:
+            children = children[:index] + children[index + 1:]
+            if not children:
+                return None, True
+            if len(children) == 1 and not isinstance(children[0], _Node):
+                return children[0], True  # a lone leaf moves up to its parent
+            return _Node(node.bitmap & ~bit, children), True
+        if len(children) == 1 and not isinstance(child, _Node):
+            return child, True
+        return _Node(node.bitmap, children[:index] + (child,) + children[index + 1:]), True
+    if isinstance(node, _Collision):
+        pairs = tuple(pair for pair in node.pairs if pair[0] != key)
+        if len(pairs) == len(node.pairs):
+            return node, False
+        if len(pairs) == 1:
+            return (h, pairs[0][0], pairs[0][1]), True
+        return _Collision(h, pairs), True
+    if node[0] == h and node[1] == key:
+        return None, True
+    return node, False
+
+
+def _build(entries, shift):
+    """A subtree over [(hash, key, value)] with distinct keys, built in one pass."""
+    if len(entries) == 1:
+        return entries[0]
+    first_hash = entries[0][0]
+    if all(entry[0] == first_hash for entry in entries):
+        return _Collision(first_hash, tuple((entry[1], entry[2]) for entry in entries))
+    buckets = {}
+    for entry in entries:
+        buckets.setdefault((entry[0] >> shift) & _MASK, []).append(entry)
+    bitmap = 0
+    for index in buckets:
+        bitmap |= 1 << index
+    return _Node(bitmap, tuple(_build(buckets[index], shift + _BITS) for index in sorted(buckets)))
+
+
+def _items(node):
+    if isinstance(node, _Node):
+        for child in node.children:
+            yield from _items(child)
+    elif isinstance(node, _Collision):
+        yield from node.pairs
+    elif node is not None:
+        yield node[1], node[2]
+
+
+class PersistentMap:
+    """Immutable mapping; set() and delete() return a new map sharing structure with this one."""
+    __slots__ = ('_root', '_len')
+
+    def __init__(self, root=None, length=0):
+        self._root = root
+        self._len = length
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        if not data:
+            return cls()
+        return cls(_build([(_hash(k), k, v) for k, v in data.items()], 0), len(data))
+
+    def get(self, key, default=None):
+        if self._root is None:
+            return default
+        return _get(self._root, _hash(key), key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key, DELETED)
+        if value is DELETED:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, DELETED) is not DELETED
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return (k for k, _v in _items(self._root))
+
+    def items(self):
+        return _items(self._root)
+
+    def to_dict(self):
+        return dict(_items(self._root))
+
+    def set(self, key, value):
+        h = _hash(key)
+        if self._root is None:
+            return PersistentMap((h, key, value), 1)
+        root, added = _set(self._root, h, key, value, 0)
+        return self if root is self._root else PersistentMap(root, self._len + added)
+
+    def delete(self, key):
+        """The map without key; this same map if key isn't in it."""
+        if self._root is None:
+            return self
+        root, removed = _delete(self._root, _hash(key), key, 0)
+        return PersistentMap(root, self._len - 1) if removed else self
+
+
+class UndoStack:
+    """Linear undo/redo over versions of the alias map.
+
+    Each step remembers its label and the keys it touched; undo and redo hand
+    back those keys' values in the target version, for the caller to apply.
+    """
+
+    def __init__(self, base: PersistentMap = None, limit: int = UNDO_LIMIT):
+        self.limit = limit
+        self.reset(base)
+
+    def reset(self, base: PersistentMap = None):
+        """Starts over from base (e.g. after the aliases changed outside the editor)."""
+        self.versions = [base or PersistentMap()]
+        self.steps = []  # steps[i] = (label, keys) turning versions[i] into versions[i + 1]
+        self.position = 0
+
+    @property
+    def current(self):
+        return self.versions[self.position]
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.steps)
+
+    def record(self, changes: dict, label: str):
+        """Records an edit: {key: new value, or DELETED}. Edits that change nothing are ignored."""
+        version = self.current
+        for key, value in changes.items():
+            version = version.delete(key) if value is DELETED else version.set(key, value)
+        if version is self.current:
+            return
+        # A new edit discards whatever could have been redone
+        del self.versions[self.position + 1:]
+        del self.steps[self.position:]
+        self.versions.append(version)
+        self.steps.append((label, tuple(changes)))
+        if len(self.steps) > self.limit:
+            del self.versions[0]
+            del self.steps[0]
+        self.position = len(self.steps)
+
+    def undo(self):
+        """(label, {key: value or DELETED}) restoring the version before the last edit."""
+        if not self.can_undo():
+            raise IndexError("nothing to undo")
+        self.position -= 1
+        label, keys = self.steps[self.position]
+        return label, self._values(keys)
+
+    def redo(self):
+        """(label, {key: value or DELETED}) re-applying the last undone edit."""
+        if not self.can_redo():
+            raise IndexError("nothing to redo")
+        label, keys = self.steps[self.position]
+        self.position += 1
+        return label, self._values(keys)
+
+    def _values(self, keys):
+        version = self.current
+        return {key: version.get(key, DELETED) for key in keys}
@@ -0,0 +1,351 @@
+"""Offline benchmarks for the alias manager's hot paths.
+
+    python benchmark.py                          # 10 .. 100,000 aliases
+    python benchmark.py --sizes 100,1000 --repeat 3 --latency 50 -o before.json
+
+Everything runs against a throwaway HOME and a local HTTP server that mimics
+the GitHub git tree and blob endpoints, so no network or real settings.json is
+touched. Results are written as JSON for comparing between versions.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+DEFAULT_SIZES = "10,100,1000,10000,100000"
+DEFAULT_REPEAT = 5
+DEFAULT_LATENCY_MS = 20
+DEFAULT_OUTPUT = "bench_results.json"
+ALIASES_PER_LIBRARY = 500
+SEED = 1234
+
+# --- SYNTHETIC DATA ---
+
+COMMANDS = ["ls", "cd", "sftp", "ssh", "ping", "traceroute", "firewall show", "firewall add",
+            "route add", "route del", "dns set", "dhcp lease", "map", "fs", "cat", "netstat"]
+WORDS = ["server", "rack", "core", "edge", "lan", "wan", "dmz", "backup", "web", "db",
+         "mail", "vpn", "proxy", "switch", "router", "printer"]
+# Aliases everyone tends to define, so library sets share bodies like real ones do
+POPULAR = {"ls": "ls -la", "fs": "firewall show", "map": "map; netstat", "r": "route add $1 $2"}
+
+
+def make_aliases(count: int, seed: int = SEED):
+    """A deterministic cmd_alias map with count entries."""
+    rng = random.Random(seed)
+    aliases = dict(list(POPULAR.items())[:count])
+    while len(aliases) < count:
+        name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}{len(aliases)}"
+        steps = [f"{rng.choice(COMMANDS)} {rng.choice(WORDS)}{rng.randint(1, 99)}" for _ in range(rng.randint(1, 6))]
+        aliases[name] = "; ".join(steps)
+    return aliases
+
+
+def make_library_set(total_aliases: int):
+    """{repo path: share string} for libraries holding total_aliases between them."""
+    count = max(1, -(-total_aliases // ALIASES_PER_LIBRARY))
+    per_library = max(1, total_aliases // count)
+    from share_codec import encode_share_string
+    return {f"library/user{i}.txt": encode_share_string(make_aliases(per_library, seed=SEED + i), method='z')
+            for i in range(count)}
+
+
+def write_settings(path: Path, aliases: dict, other_settings: int = 0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Padded with other settings, as the game's own file is
+    settings = {"audio": {"master": 0.8}, "display": {"vsync": True}, "cmd_alias": aliases}
+    if other_settings:
+        # Game state after the aliases, which reads and writes should not pay for
+        settings["save_slots"] = [{"slot": i, "devices": [{"id": j, "name": f"device{j}"} for j in range(10)]}
+                                  for i in range(other_settings)]
+    with open(path, 'w') as f:
+        json.dump(settings, f, indent=4)
+
+
+# --- LOCAL GITHUB STAND-IN ---
+
+def git_blob_sha(data: bytes):
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+class FakeGitHub:
+    """Serves /tree (git trees API, with ETags) and /blob/<sha> for a library set.
+
+    Every request sleeps latency seconds first, to stand in for the round trip.
+    """
+
+    def __init__(self, files: dict, latency: float):
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.blobs = {}
+        tree = []
+        for path, content in files.items():
+            data = content.encode('utf-8')
+            sha = git_blob_sha(data)
+            self.blobs[sha] = data
+            tree.append({'path': path, 'mode': '100644', 'type': 'blob', 'sha': sha, 'size': len(data)})
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        for entry in tree:
+            entry['url'] = f"{self.base_url}/blob/{entry['sha']}"
+        self.tree_body = json.dumps({'sha': 'bench', 'tree': tree, 'truncated': False}).encode('utf-8')
+        self.tree_etag = '"' + hashlib.md5(self.tree_body).hexdigest() + '"'
+        self.tree_url = f"{self.base_url}/tree"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with fake.lock:
+                    fake.requests += 1
+                time.sleep(fake.latency)
+                if self.path == '/tree':
+                    if self.headers.get('If-None-Match') == fake.tree_etag:
+                        self._send(304, b'', fake.tree_etag)
+                        return
+                    self._send(200, fake.tree_body, fake.tree_etag)
+                elif self.path.startswith('/blob/'):
+                    data = fake.blobs.get(self.path[len('/blob/'):])
+                    if data is None:
+                        self._send(404, b'')
+                        return
+                    body = json.dumps({'encoding': 'base64', 'content': base64.b64encode(data).decode('ascii')})
+                    self._send(200, body.encode('utf-8'))
+                else:
+                    self._send(404, b'')
+
+            def _send(self, status, body, etag=None):
+                self.send_response(status)
+                if etag:
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_archive(files: dict, path: Path):
+    """A GitHub-style tarball of files, for the archive sync mode."""
+    with tarfile.open(path, 'w:gz') as tar:
+        for repo_path, content in files.items():
+            data = content.encode('utf-8')
+            info = tarfile.TarInfo(f"tower-networking-alias-manager-main/{repo_path}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+# --- TIMING ---
+
+def measure(fn, repeat: int, setup=None):
+    """Runs fn repeat times (after setup, untimed) and returns timing stats in seconds."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'mean': statistics.fmean(times),
+            'max': max(times), 'repeat': repeat}
+
+
+class Recorder:
+    def __init__(self):
+        self.results = []
+
+    def add(self, name: str, size: int, stats: dict, **extra):
+        self.results.append({'name': name, 'size': size, **stats, **extra})
+        print(f"{name:<36} {size:>7}  median {stats['median'] * 1000:10.2f} ms  min {stats['min'] * 1000:10.2f} ms")
+
+
+# --- BENCHMARKS ---
+
+def bench_settings(rec: Recorder, size: int, repeat: int):
+    import settings_io
+    import tower_networking_share_cmd_alias as cli
+    from alias_search import AliasIndex
+    from share_codec import decode_share_string, encode_share_string
+
+    aliases = make_aliases(size)
+    write_settings(settings_io.settings_cache.path, aliases)
+    cache = settings_io.settings_cache
+    size_bytes = os.path.getsize(cache.path)
+
+    rec.add("dump_alias (cold)", size, measure(cli.dump_alias, repeat, setup=cache.invalidate), settings_bytes=size_bytes)
+    rec.add("dump_alias (warm)", size, measure(cli.dump_alias, repeat))
+    rec.add("dump_alias plain_text", size, measure(lambda: cli.dump_alias(plain_text=True), repeat))
+    rec.add("get_current_aliases (cold)", size, measure(cli.get_current_aliases, repeat, setup=cache.invalidate))
+    rec.add("get_current_aliases (warm)", size, measure(cli.get_current_aliases, repeat))
+
+    # Flip one alias each round so every save really writes. The write itself
+    # is timed directly; the writer's coalesce delay is its own row below.
+    writer = settings_io.settings_writer
+    edits = iter(range(10 ** 9))
+
+    def save():
+        edited = dict(aliases)
+        edited['bench_edit'] = f"echo {next(edits)}"
+        ok, msg = writer._write(edited, "Benchmark")
+        if not ok:
+            raise RuntimeError(msg)
+    rec.add("save_settings_to_disk", size, measure(save, repeat))
+    rec.add("save_settings_to_disk (no-op)", size, measure(lambda: writer._write(cache.get_aliases(), "Benchmark"), repeat))
+
+    def queued_save():
+        done = threading.Event()
+        edited = dict(aliases)
+        edited['bench_edit'] = f"echo {next(edits)}"
+        writer.submit(edited, lambda *r: done.set(), "Benchmark")
+        done.wait()
+    rec.add("settings writer submit -> saved", size, measure(queued_save, repeat), coalesce_delay=writer.delay)
+
+    # The same aliases in a settings file mostly made of other game state
+    write_settings(cache.path, aliases, other_settings=5000)
+    cache.invalidate()
+    padded_bytes = os.path.getsize(cache.path)
+    rec.add("get_current_aliases (cold, padded)", size, measure(cli.get_current_aliases, repeat, setup=cache.invalidate),
+            settings_bytes=padded_bytes)
+    rec.add("save_settings_to_disk (padded)", size, measure(save, repeat), settings_bytes=padded_bytes)
+    write_settings(cache.path, aliases)
+    cache.invalidate()
+
+    for method in ('auto', 'z', 'x'):
+        share = encode_share_string(aliases, method=method)
+        rec.add(f"encode_share_string ({method})", size,
+                measure(lambda: encode_share_string(aliases, method=method), repeat), chars=len(share))
+        rec.add(f"decode_share_string ({method})", size, measure(lambda: decode_share_string(share), repeat))
+
+    legacy = base64.b64encode(json.dumps(aliases).encode('utf-8')).decode('ascii')
+    rec.add("encode legacy base64", size,
+            measure(lambda: base64.b64encode(json.dumps(aliases).encode('utf-8')), repeat), chars=len(legacy))
+    rec.add("decode legacy base64", size, measure(lambda: decode_share_string(legacy), repeat))
+
+    rec.add("editor index build", size, measure(lambda: AliasIndex(aliases), repeat))
+    index = AliasIndex(aliases)
+    for query in ('ls', 'fire', 'server core', 'e', 'zzz_no_match'):
+        rec.add(f"editor filter '{query}'", size, measure(lambda: index.search(query), repeat),
+                matches=len(index.search(query)))
+    rec.add("editor single edit", size, measure(lambda: index.set('bench_edit', 'ping core1'), repeat))
+
+
+def bench_sync(rec: Recorder, size: int, repeat: int, latency: float, workdir: Path):
+    from library_sync import sync_library, sync_library_archive
+
+    files = make_library_set(size)
+    lib_path = workdir / f"library-{size}"
+
+    def fresh():
+        shutil.rmtree(lib_path, ignore_errors=True)
+
+    def report(done, total, path, error):
+        pass
+
+    with FakeGitHub(files, latency) as fake:
+        def pull():
+            result = sync_library(progress=report, tree_url=fake.tree_url, lib_path=lib_path)
+            if result.skipped:
+                raise RuntimeError(f"sync skipped files: {result.skipped}")
+
+        fake.requests = 0
+        stats = measure(pull, repeat, setup=fresh)
+        rec.add("pull_new_files (full)", size, stats, libraries=len(files),
+                requests_per_run=fake.requests // repeat, latency_ms=latency * 1000)
+
+        fake.requests = 0
+        stats = measure(pull, repeat)
+        rec.add("pull_new_files (up to date)", size, stats, libraries=len(files),
+                requests_per_run=fake.requests // repeat, latency_ms=latency * 1000)
+
+    archive = workdir / f"archive-{size}.tar.gz"
+    make_archive(files, archive)
+    rec.add("pull_new_files (archive)", size,
+            measure(lambda: sync_library_archive(progress=report, source=str(archive), lib_path=lib_path),
+                    repeat, setup=fresh), libraries=len(files))
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=Path(__file__).parent, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the alias manager against synthetic data.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="comma separated alias counts (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="runs per case (default: %(default)s)")
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY_MS,
+                        help="simulated GitHub round trip in ms (default: %(default)s)")
+    parser.add_argument('--skip-sync', action='store_true', help="leave out the library sync cases")
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help="JSON results file (default: %(default)s)")
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    output = Path(args.output).resolve()
+
+    with tempfile.TemporaryDirectory(prefix="tower-alias-bench-") as tmp:
+        workdir = Path(tmp)
+        # Point the settings path at the sandbox before settings_io reads HOME
+        os.environ['HOME'] = os.environ['USERPROFILE'] = str(workdir / 'home')
+        # A running alias daemon serves the user's live settings, not the sandbox
+        os.environ['TOWER_ALIAS_NO_DAEMON'] = '1'
+        sys.path.insert(0, str(Path(__file__).resolve().parent))
+        os.chdir(workdir)
+
+        rec = Recorder()
+        for size in sizes:
+            bench_settings(rec, size, args.repeat)
+            if not args.skip_sync:
+                bench_sync(rec, size, args.repeat, args.latency / 1000, workdir)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sizes': sizes,
+            'repeat': args.repeat,
+            'latency_ms': args.latency,
+        },
+        'results': rec.results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"\nWrote {len(rec.results)} results to {output}")
+
+
+if __name__ == '__main__':
+    main()
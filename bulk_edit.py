@@ -0,0 +1,59 @@
+import re
+
+# --- BULK FIND & REPLACE ---
+# One compiled pattern, one pass over every alias body; the caller writes the
+# result back as a single settings.json write.
+
+PROGRESS_EVERY = 2000  # aliases between progress callbacks
+
+
+class BulkEditError(ValueError):
+    pass
+
+
+class BulkEditCancelled(Exception):
+    pass
+
+
+def compile_pattern(pattern: str, regex: bool = True, ignore_case: bool = False):
+    """Compiles pattern once; literal text is escaped. Raises BulkEditError if it is invalid."""
+    if not pattern:
+        raise BulkEditError("Enter something to search for.")
+    try:
+        return re.compile(pattern if regex else re.escape(pattern), re.IGNORECASE if ignore_case else 0)
+    except re.error as e:
+        raise BulkEditError(f"Invalid pattern: {e}")
+
+
+def bulk_replace(aliases: dict, pattern, replacement: str, regex: bool = True,
+                 progress=None, cancel_event=None):
+    """Returns (changes, match_count) where changes maps each affected key to its new body.
+
+    pattern is a compiled pattern from compile_pattern(). In literal mode the
+    replacement is used as-is; in regex mode it may use \\1 or \\g<name>.
+    """
+    if not regex:
+        # A function replacement skips template parsing, so backslashes stay literal
+        literal = replacement
+        replacement = lambda match: literal
+
+    changes = {}
+    matches = 0
+    subn = pattern.subn
+    total = len(aliases)
+    for i, (key, body) in enumerate(aliases.items(), start=1):
+        if i % PROGRESS_EVERY == 0:
+            if cancel_event is not None and cancel_event.is_set():
+                raise BulkEditCancelled()
+            if progress:
+                progress(i / total)
+        if not isinstance(body, str):
+            continue
+        try:
+            new_body, count = subn(replacement, body)
+        except (re.error, IndexError) as e:
+            raise BulkEditError(f"Invalid replacement: {e}")
+        if count and new_body != body:
+            changes[key] = new_body
+            matches += count
+    return changes, matches
@@ -1,65 +1,234 @@
+import time
+STARTED = time.perf_counter()  # before the heavy imports, for the startup measurement
+
 import customtkinter as ctk
 import tkinter.messagebox as tkmb
-from pathlib import Path
 import json
-import requests
-import base64
 import sys
 import threading
+import tkinter
+
+from alias_daemon import DaemonError, connect_daemon
+from alias_diff import DEFAULT_POLICY, POLICIES, diff_aliases, merge_aliases
+from alias_history import format_snapshot
+from alias_search import AliasIndex
+from alias_undo import DELETED, PersistentMap, UndoStack
+from bulk_edit import BulkEditCancelled, BulkEditError, bulk_replace, compile_pattern
+from library_preview import PAGE_SIZE, PreviewCache, format_summary
+from settings_io import SettingsWatcher, settings_cache, settings_writer
+from share_codec import DecodeCancelled, ShareCodecError, decode_share_string, encode_share_string
+import timing
+
+# The library store (sqlite3) is imported when the Library view is first opened,
+# and the sync engine (requests) only when a sync starts, so the window appears
+# without waiting for either.
 
 # Set the theme for a professional "Network Engineer" aesthetic
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
+SEARCH_DEBOUNCE_MS = 150
+PREVIEW_CHUNK_LINES = 2000
+PREVIEW_SCROLL_POLL_MS = 150
+DIFF_PREVIEW_LIMIT = 2000
+TIMING_SEPARATOR = "   |   "
+SYNC_REPORT_LIMIT = 15
+SIMILAR_SHOWN = 3
+CLOSE_FLUSH_TIMEOUT = 5.0  # seconds the window waits for a queued save; the exit hook waits for the rest
+
+# Set by TowerAliasManager when an alias daemon is running; None means settings.json is used directly
+daemon_client = None
+daemon_writes = None  # one worker thread, so saves reach the daemon in order
+
 # --- GLOBAL HELPER FUNCTIONS ---
 
-def get_settings_path():
-    """Determines the correct path for Godot app data based on OS."""
-    home = Path.home()
-    if sys.platform == "win32":
-        base = home / "AppData" / "Roaming"
-    elif sys.platform == "darwin":
-        base = home / "Library" / "Application Support"
-    elif sys.platform == "linux":
-        base = home / ".local" / "share"
-    else:
-        base = home / ".local" / "share"
-        
-    return base / 'godot' / 'app_userdata' / 'Tower Networking Inc' / 'settings.json'
+def _lost_daemon():
+    global daemon_client
+    daemon_client = None
 
 def get_current_aliases():
-    """Reads the current settings.json and returns the dict."""
-    appdata_path = get_settings_path()
+    """Returns the current cmd_alias dict, re-reading settings.json only if it changed."""
     try:
-        with open(appdata_path, 'r') as f:
-            data = json.load(f)
-        return data.get('cmd_alias', {})
+        if daemon_client is not None:
+            try:
+                return daemon_client.get_aliases()[0]
+            except (OSError, DaemonError):
+                _lost_daemon()
+        return settings_cache.get_aliases()
     except (FileNotFoundError, json.JSONDecodeError):
         return {}
 
-def save_settings_to_disk(new_aliases: dict):
-    """Safely writes the new alias dict to settings.json."""
-    appdata_path = get_settings_path()
+def save_settings_to_disk(new_aliases: dict, widget, on_done, label: str = None):
+    """Queues the new alias dict for the background settings writer.
+
+    on_done(success, msg) is called back on the Tk thread once it is on disk
+    (or the write failed). label names the change in the alias history.
+    Through the daemon only the changed keys are sent, from a worker thread
+    since the daemon answers only after the write.
+    """
+    global daemon_writes
+    if daemon_client is not None:
+        if daemon_writes is None:
+            from concurrent.futures import ThreadPoolExecutor
+            daemon_writes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DaemonWrite")
+        daemon_writes.submit(_write_through_daemon, daemon_client, dict(new_aliases), widget, on_done, label)
+        return
+    settings_writer.submit(new_aliases, lambda success, msg: widget.after(0, lambda: on_done(success, msg)), label)
+
+def _write_through_daemon(client, new_aliases: dict, widget, on_done, label: str):
     try:
-        if appdata_path.exists():
-            with open(appdata_path, 'r') as f:
-                full_settings = json.load(f)
-        else:
-            full_settings = {}
-
-        full_settings['cmd_alias'] = new_aliases
-        
-        # Ensure directory exists
-        appdata_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(appdata_path, 'w') as f:
-            json.dump(full_settings, f, indent=4)
-        return True, "Success"
-    except Exception as e:
-        return False, str(e)
+        result = client.write(new_aliases, label)
+    except (OSError, DaemonError):
+        _lost_daemon()
+        settings_writer.submit(new_aliases, lambda success, msg: widget.after(0, lambda: on_done(success, msg)), label)
+        return
+    widget.after(0, lambda: on_done(*result))
 
 # --- GUI FRAMES ---
 
+class VirtualKeyList(ctk.CTkFrame):
+    """Scrollable key list that only renders the visible rows.
+
+    A fixed pool of buttons is recycled as the list scrolls, so the widget cost
+    is the same for 50 keys or 50,000.
+    """
+    ROW_HEIGHT = 32
+    ACTIVE_COLOR = "#1f6aa5"
+
+    def __init__(self, master, command, label_text="", **kwargs):
+        super().__init__(master, **kwargs)
+        self.command = command
+        self.keys = []
+        self.offset = 0
+        self.selected_key = None
+        self.rows = []        # Recycled buttons, top to bottom
+        self.row_keys = []    # Key each button currently shows (None if hidden)
+        self.visible_rows = 0
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.label = ctk.CTkLabel(self, text=label_text, fg_color=("gray78", "gray23"), corner_radius=6)
+        self.label.grid(row=0, column=0, columnspan=2, padx=5, pady=(5, 2), sticky="ew")
+
+        self.rows_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.rows_frame.grid(row=1, column=0, sticky="nsew")
+        self.rows_frame.grid_columnconfigure(0, weight=1)
+        self.rows_frame.grid_propagate(False)
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+
+        self.rows_frame.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.rows_frame)
+
+    # --- Public API ---
+
+    def set_keys(self, keys):
+        """Replaces the (already filtered and sorted) keys shown in the list."""
+        self.keys = keys
+        self.offset = 0
+        self._render()
+
+    def select(self, key):
+        """Moves the highlight, touching only the old and new rows."""
+        old_key, self.selected_key = self.selected_key, key
+        for i, row_key in enumerate(self.row_keys):
+            if row_key is not None and row_key in (old_key, key):
+                self.rows[i].configure(fg_color=self.ACTIVE_COLOR if row_key == key else "transparent")
+
+    def see(self, key):
+        """Scrolls so that key is visible, if it is in the list."""
+        try:
+            index = self.keys.index(key)
+        except ValueError:
+            return
+        visible = len(self.rows)
+        if index < self.offset or index >= self.offset + visible:
+            self._scroll_to(index - visible // 2)
+
+    # --- Rendering ---
+
+    def _on_resize(self, event):
+        needed = max(1, int(event.height // self._apply_widget_scaling(self.ROW_HEIGHT)))
+        while len(self.rows) < needed:
+            i = len(self.rows)
+            btn = ctk.CTkButton(self.rows_frame,
+                                text="",
+                                height=self.ROW_HEIGHT - 4,
+                                fg_color="transparent",
+                                text_color=("gray10", "gray90"),
+                                anchor="w",
+                                command=lambda i=i: self._on_row_click(i))
+            self._bind_wheel(btn)
+            self.rows.append(btn)
+            self.row_keys.append(None)
+        for i, btn in enumerate(self.rows):
+            if i >= needed and self.row_keys[i] is not None:
+                btn.grid_forget()
+                self.row_keys[i] = None
+        self.visible_rows = needed
+        self._scroll_to(self.offset)
+
+    def _render(self):
+        visible = self.visible_rows
+        for i, btn in enumerate(self.rows):
+            index = self.offset + i
+            key = self.keys[index] if i < visible and index < len(self.keys) else None
+            if key == self.row_keys[i]:
+                continue
+
+            if key is None:
+                btn.grid_forget()
+            else:
+                if self.row_keys[i] is None:
+                    btn.grid(row=i, column=0, padx=5, pady=2, sticky="ew")
+                btn.configure(text=key, fg_color=self.ACTIVE_COLOR if key == self.selected_key else "transparent")
+            self.row_keys[i] = key
+
+        total = len(self.keys)
+        if total and visible:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _scroll_to(self, offset):
+        visible = self.visible_rows
+        offset = max(0, min(int(offset), len(self.keys) - visible))
+        self.offset = offset
+        self._render()
+
+    # --- Events ---
+
+    def _on_row_click(self, i):
+        key = self.row_keys[i]
+        if key is not None:
+            self.command(key)
+
+    def _on_scrollbar(self, *args):
+        visible = max(1, self.visible_rows)
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * len(self.keys))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (visible if args[2] == "pages" else 1)
+            self._scroll_to(self.offset + step)
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            step = -3
+        elif event.num == 5:
+            step = 3
+        elif sys.platform == "darwin":
+            step = -event.delta
+        else:
+            step = -3 * int(event.delta / 120)
+        self._scroll_to(self.offset + step)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel, add="+")
+        widget.bind("<Button-4>", self._on_wheel, add="+")
+        widget.bind("<Button-5>", self._on_wheel, add="+")
+
 class EditorFrame(ctk.CTkFrame):
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
@@ -80,14 +249,18 @@ class EditorFrame(ctk.CTkFrame):
 
         # 2. Search Bar
         self.search_var = ctk.StringVar()
-        self.search_var.trace_add("write", self.update_search)
-        self.entry_search = ctk.CTkEntry(self.left_container, placeholder_text="Search keys...", textvariable=self.search_var)
+        self.search_var.trace_add("write", self.schedule_search)
+        self.entry_search = ctk.CTkEntry(self.left_container, placeholder_text="Search keys & commands...", textvariable=self.search_var)
         self.entry_search.grid(row=1, column=0, padx=5, pady=(0, 10), sticky="ew")
 
-        # 3. Scrollable Key List
-        self.key_list_frame = ctk.CTkScrollableFrame(self.left_container, label_text="Alias Keys")
+        # 3. Scrollable Key List (virtualized, see VirtualKeyList)
+        self.key_list_frame = VirtualKeyList(self.left_container, command=self.select_key, label_text="Alias Keys", width=200)
         self.key_list_frame.grid(row=2, column=0, sticky="nsew")
 
+        # 4. Bulk edit across every alias
+        self.btn_replace = ctk.CTkButton(self.left_container, text="Find & Replace", fg_color="gray30", command=lambda: BulkEditDialog(self))
+        self.btn_replace.grid(row=3, column=0, padx=5, pady=10, sticky="ew")
+
         # --- RIGHT COLUMN: VALUE EDITOR ---
         self.edit_container = ctk.CTkFrame(self)
         self.edit_container.grid(row=0, column=1, sticky="nsew")
@@ -104,43 +277,86 @@ class EditorFrame(ctk.CTkFrame):
         self.btn_save.grid(row=2, column=0, pady=20)
 
         self.all_aliases = {}
+        self.search_index = AliasIndex()
+        self.undo_stack = UndoStack()
+        self.search_job = None
         self.selected_key = None
-
-    def load_aliases(self):
-        self.all_aliases = get_current_aliases()
+        self.load_generation = 0
+        self.on_first_load = None  # called once, after the first load finishes
+
+        # Ctrl+Z / Ctrl+Y (or Ctrl+Shift+Z) undo and redo saved edits, except while typing
+        root = self.winfo_toplevel()
+        root.bind("<Control-z>", self.undo_event, add="+")
+        root.bind("<Control-y>", self.redo_event, add="+")
+        root.bind("<Control-Shift-Z>", self.redo_event, add="+")
+
+    def load_aliases(self, keep_selection: bool = False):
+        """Reads and indexes the aliases on a worker thread, then fills the list.
+
+        With keep_selection the open edit survives (for changes made outside the editor).
+        """
+        self.load_generation += 1
+        generation = self.load_generation
+        if not self.all_aliases:
+            self.key_list_frame.label.configure(text="Loading aliases...")
+
+        def work():
+            # A save still waiting out its coalesce delay lands first (merged with any
+            # outside change), so the reload shows it
+            settings_writer.flush()
+            with timing.span('load_aliases'):
+                aliases = get_current_aliases()
+                index = AliasIndex(aliases)
+                base = PersistentMap.from_dict(aliases)
+            self.after(0, lambda: self._aliases_loaded(generation, aliases, index, base, keep_selection))
+
+        threading.Thread(target=work, name="LoadAliases", daemon=True).start()
+
+    def _aliases_loaded(self, generation, aliases, index, base, keep_selection):
+        if generation != self.load_generation or not self.winfo_exists():
+            return  # A newer load is on its way
+        if aliases != self.all_aliases:
+            # Changed outside the editor: undoing past that would silently revert it
+            self.undo_stack.reset(base)
+        self.all_aliases = aliases
+        self.search_index = index
+        self.key_list_frame.label.configure(text="Alias Keys")
         self.update_search()
-        self.selected_key = None
-        self.label_editing.configure(text="Select a key to edit", text_color="white")
-        self.val_textbox.delete("0.0", "end")
+        if keep_selection and self.selected_key in self.all_aliases:
+            self.key_list_frame.select(self.selected_key)
+        else:
+            self.selected_key = None
+            self.key_list_frame.select(None)
+            self.label_editing.configure(text="Select a key to edit", text_color="white")
+            if not keep_selection:
+                self.val_textbox.delete("0.0", "end")
+        if self.on_first_load is not None:
+            callback, self.on_first_load = self.on_first_load, None
+            callback()
+
+    def reload_from_disk(self):
+        """Picks up aliases changed outside the editor without touching the open edit."""
+        self.load_aliases(keep_selection=True)
+
+    def schedule_search(self, *args):
+        """Debounces typing so the index is queried once the user pauses."""
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DEBOUNCE_MS, self.update_search)
 
     def update_search(self, *args):
-        search_query = self.search_var.get().lower()
-        
-        for child in self.key_list_frame.winfo_children():
-            child.destroy()
-        self.button_map = {}
-        
-        for key in sorted(self.all_aliases.keys()):
-            if search_query in key.lower():
-                btn = ctk.CTkButton(self.key_list_frame, 
-                                  text=key, 
-                                  fg_color="transparent", 
-                                  text_color=("gray10", "gray90"), 
-                                  anchor="w", 
-                                  command=lambda k=key: self.select_key(k))
-                btn.pack(fill="x", padx=5, pady=2)
-                
-                self.button_map[key] = btn
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+            self.search_job = None
+        with timing.span('update_search (editor)'):
+            self.key_list_frame.set_keys(self.search_index.search(self.search_var.get()))
 
     def select_key(self, key):
         self.selected_key = key
-        
-        # 3. Highlight Logic: Loop through map to update colors
-        for k, btn in self.button_map.items():
-            if k == key:
-                btn.configure(fg_color="#1f6aa5") # Active Color
-            else:
-                btn.configure(fg_color="transparent") # Inactive Color
+        # Out of the search box, so Ctrl+Z means undo an edit rather than a keystroke
+        self.key_list_frame.focus_set()
+        self.key_list_frame.select(key)
+        self.key_list_frame.see(key)
 
         self.label_editing.configure(text=f"Editing Alias: {key}", text_color="white")
         self.val_textbox.delete("0.0", "end")
@@ -168,18 +384,20 @@ class EditorFrame(ctk.CTkFrame):
 
             # Update Internal Dict
             self.all_aliases[new_key] = ""
+            self.search_index.set(new_key, "")
+            self.undo_stack.record({new_key: ""}, f"Add {new_key}")
             
-            # Save to Disk immediately (so it persists)
-            success, msg = save_settings_to_disk(self.all_aliases)
-            
-            if success:
-                # Refresh list and select the new key
-                self.update_search() 
-                self.select_key(new_key)
-                # Clear search so the new item definitely shows up
-                self.search_var.set("")
-            else:
-                tkmb.showerror("Error", f"Could not create alias: {msg}")
+            # Save to Disk (queued, so it persists without blocking the UI)
+            def on_saved(success, msg):
+                if not success:
+                    tkmb.showerror("Error", f"Could not create alias: {msg}")
+            save_settings_to_disk(self.all_aliases, self, on_saved, f"Add {new_key}")
+
+            # Clear search so the new item definitely shows up
+            self.search_var.set("")
+            # Refresh list and select the new key
+            self.update_search() 
+            self.select_key(new_key)
 
     def save_entry_event(self):
         if not self.selected_key: return
@@ -189,10 +407,87 @@ class EditorFrame(ctk.CTkFrame):
         new_value = ';'.join(clean_lines)
         
         self.all_aliases[self.selected_key] = new_value
-        success, msg = save_settings_to_disk(self.all_aliases)
-        
+        self.search_index.set(self.selected_key, new_value)
+        self.undo_stack.record({self.selected_key: new_value}, f"Edit {self.selected_key}")
+        self.label_editing.configure(text=f"Saving: {self.selected_key}...", text_color="white")
+        save_settings_to_disk(self.all_aliases, self, lambda success, msg, key=self.selected_key: self._on_saved(key, success, msg),
+                              f"Edit {self.selected_key}")
+
+    def apply_bulk_changes(self, changes: dict, label: str):
+        """Applies many edits to the editor and saves them as one write."""
+        for key, value in changes.items():
+            self.all_aliases[key] = value
+            self.search_index.set(key, value)
+        self.undo_stack.record(changes, label)
+        self.update_search()
+        if self.selected_key in changes:
+            self.select_key(self.selected_key)
+
+        def on_saved(success, msg):
+            if success:
+                self.label_editing.configure(text=f"Updated {len(changes)} aliases.", text_color="#28a745")
+            else:
+                tkmb.showerror("Error", f"Could not save bulk edit: {msg}")
+        save_settings_to_disk(self.all_aliases, self, on_saved, label)
+
+    def _handles_shortcut(self):
+        """False while the editor is hidden or a text field has focus (its own keys win there)."""
+        if not self.winfo_viewable():
+            return False
+        try:
+            focus = self.focus_get()
+        except KeyError:
+            return True  # focus is in a popup menu Tk can't name
+        return not isinstance(focus, (tkinter.Text, tkinter.Entry))
+
+    def undo_event(self, event=None):
+        if not self._handles_shortcut():
+            return None
+        if not self.undo_stack.can_undo():
+            self.label_editing.configure(text="Nothing to undo.", text_color="white")
+            return "break"
+        label, values = self.undo_stack.undo()
+        self._apply_history(values, f"Undo {label}")
+        return "break"
+
+    def redo_event(self, event=None):
+        if not self._handles_shortcut():
+            return None
+        if not self.undo_stack.can_redo():
+            self.label_editing.configure(text="Nothing to redo.", text_color="white")
+            return "break"
+        label, values = self.undo_stack.redo()
+        self._apply_history(values, f"Redo {label}")
+        return "break"
+
+    def _apply_history(self, values: dict, label: str):
+        """Puts the keys an undo or redo touches back to {key: value or DELETED} and saves."""
+        for key, value in values.items():
+            if value is DELETED:
+                self.all_aliases.pop(key, None)
+                self.search_index.remove(key)
+            else:
+                self.all_aliases[key] = value
+                self.search_index.set(key, value)
+        self.update_search()
+        if self.selected_key in values:
+            if self.selected_key in self.all_aliases:
+                self.select_key(self.selected_key)
+            else:
+                self.selected_key = None
+                self.key_list_frame.select(None)
+                self.val_textbox.delete("0.0", "end")
+
+        def on_saved(success, msg):
+            if success:
+                self.label_editing.configure(text=f"{label}.", text_color="#28a745")
+            else:
+                self.label_editing.configure(text=f"Error: {msg}", text_color="red")
+        save_settings_to_disk(self.all_aliases, self, on_saved, label)
+
+    def _on_saved(self, key, success, msg):
         if success:
-            self.label_editing.configure(text=f"Saved: {self.selected_key}!", text_color="#28a745")
+            self.label_editing.configure(text=f"Saved: {key}!", text_color="#28a745")
             self.after(2000, lambda: self.label_editing.configure(text=f"Editing Alias: {self.selected_key}", text_color="white"))
         else:
             self.label_editing.configure(text=f"Error: {msg}", text_color="red")
@@ -206,9 +501,24 @@ class LibraryFrame(ctk.CTkFrame):
         self.grid_columnconfigure(1, weight=1) # Preview
         self.grid_rowconfigure(0, weight=1)
 
-        # --- LEFT: FILE LIST ---
-        self.file_list_frame = ctk.CTkScrollableFrame(self, width=180, label_text="Available Libraries", fg_color="transparent")
-        self.file_list_frame.grid(row=0, column=0, padx=5, pady=5, sticky="nsew")
+        # --- LEFT: SEARCH & FILE LIST ---
+        self.left_container = ctk.CTkFrame(self, width=220, fg_color="transparent")
+        self.left_container.grid(row=0, column=0, padx=5, pady=5, sticky="nsew")
+        self.left_container.grid_rowconfigure(1, weight=1)
+        self.left_container.grid_columnconfigure(0, weight=1)
+        self.left_container.grid_propagate(False)
+
+        self.search_var = ctk.StringVar()
+        self.search_var.trace_add("write", self.schedule_search)
+        self.entry_search = ctk.CTkEntry(self.left_container, placeholder_text="Search all libraries...", textvariable=self.search_var)
+        self.entry_search.grid(row=0, column=0, padx=5, pady=(5, 10), sticky="ew")
+
+        self.file_list_frame = VirtualKeyList(self.left_container, command=self.select_file, label_text="Available Libraries", fg_color="transparent")
+        self.file_list_frame.grid(row=1, column=0, sticky="nsew")
+
+        self.collapse_var = ctk.BooleanVar(value=True)
+        self.check_collapse = ctk.CTkCheckBox(self.left_container, text="Collapse near-duplicates", variable=self.collapse_var, command=self.update_search)
+        self.check_collapse.grid(row=2, column=0, padx=5, pady=(5, 0), sticky="w")
 
         # --- RIGHT: PREVIEW & IMPORT ---
         self.preview_container = ctk.CTkFrame(self)
@@ -228,58 +538,384 @@ class LibraryFrame(ctk.CTkFrame):
 
         self.selected_file_data = None
         self.selected_filename = None
+        self.store = None
+        self.search_job = None
+        self.preview_cache = None
+        self.preview = None
+        self.preview_rendered = 0
+        self.scroll_job = None
+        self.clusters = None
+        self.downloading = None  # library being fetched after a metadata-only sync
 
     def refresh_list(self):
-        for child in self.file_list_frame.winfo_children():
-            child.destroy()
+        if self.store is None:
+            from library_store import LibraryStore
+            self.store = LibraryStore()
+            self.preview_cache = PreviewCache(self.store)
+        else:
+            # A sync may have changed libraries behind this connection's back
+            self.store.similarity = None
+        self.clusters = None
+        self.update_search()
+        if self.scroll_job is None and self.preview is not None:
+            self.scroll_job = self.after(PREVIEW_SCROLL_POLL_MS, self._check_preview_scroll)
 
-        lib_path = Path('library')
-        if not lib_path.exists():
-            lib_path.mkdir()
-            
-        files = list(lib_path.glob('*.json'))
-        if not files:
-            lbl = ctk.CTkLabel(self.file_list_frame, text="No files found.\nSync GitHub first!")
-            lbl.pack(pady=10)
+    def schedule_search(self, *args):
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DEBOUNCE_MS, self.update_search)
+
+    def update_search(self, *args):
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+            self.search_job = None
+        if self.store is None:
             return
 
-        for f in files:
-            btn = ctk.CTkButton(self.file_list_frame, text=f.name, anchor="w", fg_color="transparent", border_width=1, text_color=("gray10", "gray90"), command=lambda x=f: self.select_file(x))
-            btn.pack(fill="x", padx=5, pady=2)
+        query = self.search_var.get()
+        with timing.span('update_search (library)'):
+            matches = self.store.libraries_matching(query)
+            names = [name for name, _count, _hits in matches]
+            if self.collapse_var.get() and len(names) > 1:
+                from library_similarity import collapse
+                if self.clusters is None:
+                    with timing.span('duplicate_clusters'):
+                        self.clusters = self.store.duplicate_clusters()
+                names, _hidden = collapse(names, {name: count for name, count, _hits in matches}, self.clusters)
+            self.file_list_frame.set_keys(names)
+
+        hidden = f" ({len(matches) - len(names)} near-duplicates hidden)" if len(names) < len(matches) else ""
+        if query.strip():
+            total_hits = sum(hits for _name, _count, hits in matches)
+            self.file_list_frame.label.configure(text=f"{len(matches)} libraries, {total_hits} hits{hidden}")
+        elif matches:
+            self.file_list_frame.label.configure(text=f"Available Libraries ({len(matches)}){hidden}")
+        else:
+            self.file_list_frame.label.configure(text="No files found.\nSync GitHub first!")
 
-    def select_file(self, filepath):
+    @timing.timed('select_file')
+    def select_file(self, name):
+        if not self.store.is_downloaded(name):
+            self._download(name)
+            return
         try:
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-            
-            if 'plaintext' in data:
-                self.selected_file_data = data['plaintext']
-            else:
-                self.selected_file_data = data
-            
-            self.selected_filename = filepath.name
-            
-            formatted_json = json.dumps(self.selected_file_data, indent=4)
+            # Stats come straight from the store, before any alias is rendered
+            text = f"Previewing: {name} ({format_summary(self.store.get_info(name))})"
+            similar = self.store.similar_libraries(name)
+            if similar:
+                shown = ", ".join(f"{other} {score:.0%}" for other, score in similar[:SIMILAR_SHOWN])
+                more = f" +{len(similar) - SIMILAR_SHOWN} more" if len(similar) > SIMILAR_SHOWN else ""
+                text += f"\nSimilar to: {shown}{more}"
+            self.label_preview.configure(text=text)
+
+            self.preview = self.preview_cache.get(name)
+            self.selected_file_data = self.preview.aliases
+            self.selected_filename = name
+            self.file_list_frame.select(name)
+
             self.preview_textbox.configure(state="normal")
             self.preview_textbox.delete("0.0", "end")
-            self.preview_textbox.insert("0.0", formatted_json)
             self.preview_textbox.configure(state="disabled")
-            
-            self.label_preview.configure(text=f"Previewing: {filepath.name}")
-            self.btn_import.configure(state="normal", text=f"Overwrite Settings with {filepath.name}")
+            self.preview_rendered = 0
+            self._render_next_page()
+            self.preview_textbox.yview_moveto(0)
+
+            self.btn_import.configure(state="normal", text=f"Merge {name} into Settings...")
 
         except Exception as e:
             tkmb.showerror("Error", f"Could not read file: {e}")
 
+    def _download(self, name):
+        """Fetches a library a metadata-only sync listed, then opens it."""
+        self.selected_file_data = None
+        self.selected_filename = None
+        self.file_list_frame.select(name)
+        self.btn_import.configure(state="disabled", text="Import This Library")
+        self.label_preview.configure(text=f"Downloading {name}...")
+        if self.downloading is not None:
+            self.downloading = name  # the running fetch opens whichever is wanted last
+            return
+        self.downloading = name
+
+        def work():
+            from library_sync import fetch_library
+            try:
+                with timing.span('fetch_library'):
+                    report = fetch_library(name)
+                error = None if report.valid else report.error
+            except Exception as e:
+                error = str(e)
+            self.after(0, lambda: self._downloaded(name, error))
+
+        threading.Thread(target=work, name="FetchLibrary", daemon=True).start()
+
+    def _downloaded(self, name, error):
+        wanted, self.downloading = self.downloading, None
+        if error is None:
+            # The similarity index was built without it
+            self.store.similarity = None
+            self.clusters = None
+        if wanted != name:
+            self.select_file(wanted)
+        elif error is not None:
+            self.label_preview.configure(text=f"Could not download {name}: {error}")
+        else:
+            self.select_file(name)
+
+    def _render_next_page(self):
+        text = self.preview.render_page(self.preview_rendered)
+        self.preview_rendered = min(len(self.preview), self.preview_rendered + PAGE_SIZE)
+        self.preview_textbox.configure(state="normal")
+        self.preview_textbox.insert("end", text)
+        self.preview_textbox.configure(state="disabled")
+
+        if self.preview_rendered < len(self.preview) and self.scroll_job is None:
+            self.scroll_job = self.after(PREVIEW_SCROLL_POLL_MS, self._check_preview_scroll)
+
+    def _check_preview_scroll(self):
+        """Loads the next page once the user scrolls near the end of what is rendered."""
+        self.scroll_job = None
+        if self.preview is None or self.preview_rendered >= len(self.preview):
+            return
+        if self.preview_textbox.yview()[1] > 0.9:
+            self._render_next_page()
+        elif self.winfo_viewable():
+            self.scroll_job = self.after(PREVIEW_SCROLL_POLL_MS, self._check_preview_scroll)
+
     def import_event(self):
         if not self.selected_file_data: return
         
-        if tkmb.askyesno("Confirm Overwrite", f"Are you sure you want to replace ALL current aliases with content from {self.selected_filename}?"):
-            success, msg = save_settings_to_disk(self.selected_file_data)
+        def on_saved(success, msg):
             if success:
                 tkmb.showinfo("Success", "Library imported successfully!")
             else:
                 tkmb.showerror("Error", f"Failed to save: {msg}")
+        MergeDialog(self, self.selected_file_data, self.selected_filename, on_saved)
+
+class BulkEditDialog(ctk.CTkToplevel):
+    """Find & replace over every alias body, previewed as a diff and saved in one write."""
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.title("Find & Replace")
+        self.geometry("750x600")
+        self.transient(editor.winfo_toplevel())
+        self.editor = editor
+        self.cancel = None
+        self.changes = None
+        self.source = None
+
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(4, weight=1)
+
+        ctk.CTkLabel(self, text="Find:").grid(row=0, column=0, padx=(20, 5), pady=(15, 5), sticky="w")
+        self.find_var = ctk.StringVar()
+        ctk.CTkEntry(self, textvariable=self.find_var, font=("Courier New", 13)).grid(row=0, column=1, padx=(5, 20), pady=(15, 5), sticky="ew")
+
+        ctk.CTkLabel(self, text="Replace:").grid(row=1, column=0, padx=(20, 5), pady=5, sticky="w")
+        self.replace_var = ctk.StringVar()
+        ctk.CTkEntry(self, textvariable=self.replace_var, font=("Courier New", 13)).grid(row=1, column=1, padx=(5, 20), pady=5, sticky="ew")
+
+        options = ctk.CTkFrame(self, fg_color="transparent")
+        options.grid(row=2, column=0, columnspan=2, padx=20, pady=5, sticky="w")
+        self.regex_var = ctk.BooleanVar(value=False)
+        self.case_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(options, text="Regular expression", variable=self.regex_var).pack(side="left", padx=(0, 15))
+        ctk.CTkCheckBox(options, text="Ignore case", variable=self.case_var).pack(side="left", padx=(0, 15))
+        ctk.CTkButton(options, text="Preview", width=100, command=self.preview_event).pack(side="left")
+
+        self.label_result = ctk.CTkLabel(self, text="Preview shows every alias that would change.", anchor="w")
+        self.label_result.grid(row=3, column=0, columnspan=2, padx=20, pady=5, sticky="ew")
+
+        self.diff_textbox = ctk.CTkTextbox(self, font=("Courier New", 12))
+        self.diff_textbox.grid(row=4, column=0, columnspan=2, padx=20, pady=5, sticky="nsew")
+        self.diff_textbox.configure(state="disabled")
+
+        self.btn_apply = ctk.CTkButton(self, text="Apply", state="disabled", fg_color="#d9534f", hover_color="#c9302c", command=self.apply_event)
+        self.btn_apply.grid(row=5, column=0, columnspan=2, padx=20, pady=(5, 20))
+
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+    def close(self):
+        if self.cancel is not None:
+            self.cancel.set()
+        self.destroy()
+
+    def preview_event(self):
+        regex = self.regex_var.get()
+        try:
+            pattern = compile_pattern(self.find_var.get(), regex, self.case_var.get())
+        except BulkEditError as e:
+            self.label_result.configure(text=str(e))
+            return
+
+        if self.cancel is not None:
+            self.cancel.set()
+        cancel = self.cancel = threading.Event()
+        self.btn_apply.configure(state="disabled")
+        self.changes = None
+        self.source = dict(self.editor.all_aliases)
+        replacement = self.replace_var.get()
+        self.label_result.configure(text="Searching...")
+        threading.Thread(target=self._preview_worker, args=(self.source, pattern, replacement, regex, cancel), daemon=True).start()
+
+    def _preview_worker(self, source, pattern, replacement, regex, cancel):
+        def post(callback):
+            self.after(0, lambda: None if cancel.is_set() or not self.winfo_exists() else callback())
+
+        try:
+            with timing.span('bulk_replace'):
+                changes, matches = bulk_replace(source, pattern, replacement, regex, cancel_event=cancel,
+                                                progress=lambda f: post(lambda: self.label_result.configure(text=f"Searching... {f:.0%}")))
+                rendered = diff_aliases(source, {**source, **changes}).render(limit=DIFF_PREVIEW_LIMIT)
+        except BulkEditCancelled:
+            return
+        except BulkEditError as e:
+            post(lambda: self.label_result.configure(text=str(e)))
+            return
+        post(lambda: self._show_preview(changes, matches, rendered))
+
+    def _show_preview(self, changes, matches, rendered):
+        self.changes = changes
+        self.label_result.configure(text=f"{matches} matches in {len(changes)} aliases.")
+        self.diff_textbox.configure(state="normal")
+        self.diff_textbox.delete("0.0", "end")
+        self.diff_textbox.insert("0.0", rendered or "No aliases would change.")
+        self.diff_textbox.configure(state="disabled")
+        self.btn_apply.configure(state="normal" if changes else "disabled")
+
+    def apply_event(self):
+        if not self.changes:
+            return
+        # Skip anything edited in the main window since the preview was taken
+        current = self.editor.all_aliases
+        changes = {key: value for key, value in self.changes.items() if current.get(key) == self.source[key]}
+        label = f"Replace {self.find_var.get()!r} in {len(changes)} aliases"
+        self.destroy()
+        if changes:
+            self.editor.apply_bulk_changes(changes, label)
+
+class MergeDialog(ctk.CTkToplevel):
+    """Shows only what an import would change and applies it with a merge policy.
+
+    on_done(success, msg) runs on the Tk thread after the write; it is not
+    called when the import turns out to change nothing.
+    """
+    MAX_CHECKBOXES = 500
+
+    def __init__(self, master, incoming: dict, source_name: str, on_done):
+        super().__init__(master)
+        self.title(f"Import from {source_name}")
+        self.geometry("700x650")
+        self.transient(master)
+        self.on_done = on_done
+        self.source_name = source_name
+        self.diff = diff_aliases(get_current_aliases(), incoming)
+        differences = self.diff.differences
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.label_summary = ctk.CTkLabel(self, text=f"{source_name}: {self.diff.summary()}", font=ctk.CTkFont(weight="bold"))
+        self.label_summary.grid(row=0, column=0, padx=20, pady=(15, 5), sticky="w")
+
+        self.diff_textbox = ctk.CTkTextbox(self, font=("Courier New", 12))
+        self.diff_textbox.grid(row=1, column=0, padx=20, pady=5, sticky="nsew")
+        self.diff_textbox.insert("0.0", self.diff.render(limit=DIFF_PREVIEW_LIMIT) or "Nothing to import. Your aliases already match.")
+        self.diff_textbox.configure(state="disabled")
+
+        # Optional per-key selection; huge diffs are handled by policy alone
+        self.check_vars = {}
+        if differences and len(differences) <= self.MAX_CHECKBOXES:
+            self.key_frame = ctk.CTkScrollableFrame(self, height=120, label_text="Only import these keys (optional)")
+            self.key_frame.grid(row=2, column=0, padx=20, pady=5, sticky="ew")
+            for status, key in differences:
+                var = ctk.BooleanVar(value=False)
+                ctk.CTkCheckBox(self.key_frame, text=f"{status}: {key}", variable=var).pack(anchor="w", padx=5, pady=1)
+                self.check_vars[key] = var
+
+        self.policy_var = ctk.StringVar(value=POLICIES[DEFAULT_POLICY])
+        self.policy_buttons = ctk.CTkSegmentedButton(self, values=list(POLICIES.values()), variable=self.policy_var)
+        self.policy_buttons.grid(row=3, column=0, padx=20, pady=10)
+
+        self.button_row = ctk.CTkFrame(self, fg_color="transparent")
+        self.button_row.grid(row=4, column=0, padx=20, pady=(5, 20))
+        self.btn_apply = ctk.CTkButton(self.button_row, text="Import", fg_color="#d9534f", hover_color="#c9302c", command=self.apply_event)
+        self.btn_apply.pack(side="left", padx=5)
+        ctk.CTkButton(self.button_row, text="Cancel", fg_color="gray", command=self.destroy).pack(side="left", padx=5)
+        if not differences:
+            self.btn_apply.configure(state="disabled")
+
+    def apply_event(self):
+        policy = next(key for key, label in POLICIES.items() if label == self.policy_var.get())
+        selected = [key for key, var in self.check_vars.items() if var.get()] or None
+        merged = merge_aliases(self.diff, policy, selected)
+
+        master = self.master
+        self.destroy()
+        if merged == self.diff.current:
+            tkmb.showinfo("Nothing to change", "That import would not change any aliases.")
+            return
+        save_settings_to_disk(merged, master, self.on_done, f"Import {self.source_name}")
+
+class HistoryDialog(ctk.CTkToplevel):
+    """Lists alias snapshots and rolls cmd_alias back to the chosen one."""
+    MAX_ENTRIES = 500
+
+    def __init__(self, master, on_restored):
+        super().__init__(master)
+        self.title("Alias History")
+        self.geometry("900x600")
+        self.transient(master)
+        self.on_restored = on_restored
+        self.selected_id = None
+        self.selected_aliases = None
+
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        entries = settings_writer.history.list_snapshots(self.MAX_ENTRIES)
+        self.entries = {format_snapshot(entry): entry['id'] for entry in entries}
+        self.snapshot_list = VirtualKeyList(self, command=self.select_snapshot, width=420,
+                                            label_text=f"Snapshots ({len(entries)})" if entries else "No history yet")
+        self.snapshot_list.grid(row=0, column=0, rowspan=2, padx=(20, 10), pady=20, sticky="nsew")
+        self.snapshot_list.set_keys(list(self.entries))
+
+        self.label_changes = ctk.CTkLabel(self, text="Select a snapshot to see what restoring it would change", anchor="w")
+        self.label_changes.grid(row=0, column=1, padx=(10, 20), pady=(20, 5), sticky="nw")
+
+        self.diff_textbox = ctk.CTkTextbox(self, font=("Courier New", 12))
+        self.diff_textbox.grid(row=0, column=1, padx=(10, 20), pady=(50, 5), sticky="nsew")
+        self.diff_textbox.configure(state="disabled")
+
+        self.btn_restore = ctk.CTkButton(self, text="Restore", state="disabled", fg_color="#d9534f", hover_color="#c9302c", command=self.restore_event)
+        self.btn_restore.grid(row=1, column=1, padx=(10, 20), pady=(5, 20))
+
+    def select_snapshot(self, key):
+        self.snapshot_list.select(key)
+        self.selected_id = self.entries[key]
+        try:
+            self.selected_aliases = settings_writer.history.restore(self.selected_id)
+        except (KeyError, OSError, ValueError) as e:
+            tkmb.showerror("Error", f"Could not read snapshot: {e}")
+            return
+
+        diff = diff_aliases(get_current_aliases(), self.selected_aliases)
+        self.label_changes.configure(text=f"Restoring #{self.selected_id}: {diff.summary()}")
+        self.diff_textbox.configure(state="normal")
+        self.diff_textbox.delete("0.0", "end")
+        self.diff_textbox.insert("0.0", diff.render(limit=DIFF_PREVIEW_LIMIT) or "Identical to your current aliases.")
+        self.diff_textbox.configure(state="disabled")
+        self.btn_restore.configure(state="normal" if diff.differences else "disabled")
+
+    def restore_event(self):
+        if self.selected_aliases is None:
+            return
+        if not tkmb.askyesno("Confirm Restore", f"Replace your current aliases with snapshot #{self.selected_id}?\nThis restore is itself recorded, so it can be undone."):
+            return
+        master = self.master
+        self.destroy()
+        save_settings_to_disk(self.selected_aliases, master, self.on_restored, f"Restore #{self.selected_id}")
 
 # --- MAIN APP ---
 
@@ -312,7 +948,7 @@ class TowerAliasManager(ctk.CTk):
         self.logo_label = ctk.CTkLabel(self.sidebar_frame, text="THE FORGE", font=ctk.CTkFont(size=20, weight="bold"))
         self.logo_label.grid(row=0, column=0, padx=20, pady=(20, 10))
 
-        self.btn_copy_b64 = ctk.CTkButton(self.sidebar_frame, text="Copy Base64 String", fg_color="#b97900", hover_color="#976200", command=self.copy_base64_event)
+        self.btn_copy_b64 = ctk.CTkButton(self.sidebar_frame, text="Copy Share String", fg_color="#b97900", hover_color="#976200", command=self.copy_base64_event)
         self.btn_copy_b64.grid(row=1, column=0, padx=20, pady=10)
 
         self.btn_editor = ctk.CTkButton(self.sidebar_frame, text="Edit Current Alias", command=self.show_editor)
@@ -321,12 +957,16 @@ class TowerAliasManager(ctk.CTk):
         self.btn_library = ctk.CTkButton(self.sidebar_frame, text="Library Explorer", command=self.show_library)
         self.btn_library.grid(row=3, column=0, padx=20, pady=10)
 
-        self.btn_view_b64 = ctk.CTkButton(self.sidebar_frame, text="View Base64 String", fg_color="#1f6aa5", command=self.view_base64_event)
+        self.btn_view_b64 = ctk.CTkButton(self.sidebar_frame, text="View Share String", fg_color="#1f6aa5", command=self.view_base64_event)
         self.btn_view_b64.grid(row=4, column=0, padx=20, pady=10)
 
         self.btn_sync = ctk.CTkButton(self.sidebar_frame, text="Sync GitHub", command=self.sync_github)
         self.btn_sync.grid(row=5, column=0, padx=20, pady=10)
 
+        self.btn_history = ctk.CTkButton(self.sidebar_frame, text="History", fg_color="gray30", command=self.history_event)
+        self.btn_history.grid(row=6, column=0, padx=20, pady=10)
+        self.sync_cancel_event = None
+
         # --- CONTENT FRAMES ---
         self.main_container = ctk.CTkFrame(self, fg_color="transparent")
         self.main_container.grid(row=0, column=1, padx=0, pady=0, sticky="nsew")
@@ -334,12 +974,87 @@ class TowerAliasManager(ctk.CTk):
         self.main_container.grid_rowconfigure(0, weight=1)
 
         self.editor_view = EditorFrame(self.main_container)
-        self.library_view = LibraryFrame(self.main_container)
+        self.library_view = None  # built on first use, see show_library
 
         self.status_label = ctk.CTkLabel(self, text="Application Ready", anchor="w")
         self.status_label.grid(row=1, column=0, columnspan=2, padx=20, pady=5, sticky="we")
 
-        self.show_editor()
+        self.startup_painted = False
+        self.bind("<Map>", self._first_paint, add="+")
+        self.editor_view.on_first_load = self._first_aliases_loaded
+        self.editor_view.grid(row=0, column=0, sticky="nsew")
+        self.status_label.configure(text="Editor Mode")
+
+        # Live reload when the game (or anything else) rewrites settings.json. A
+        # running daemon watches the file itself and also reports other clients' edits.
+        # Connecting happens off the Tk thread, and the first load waits for it so
+        # it reads from the daemon when there is one.
+        self.settings_watcher = None
+        self.daemon_events = None
+        threading.Thread(target=self._connect_daemon, name="ConnectDaemon", daemon=True).start()
+
+        if timing.enabled:
+            timing.add_listener(lambda *span: self.after(0, lambda: self._show_timing(*span)))
+
+    def _connect_daemon(self):
+        client = connect_daemon()
+        events = None
+        if client is not None:
+            own_id = client.client_id
+            try:
+                events = client.subscribe(
+                    lambda event: event.get('client') != own_id and self.after(0, self._settings_changed_on_disk))
+            except (OSError, ValueError, DaemonError):
+                client.close()
+                client = None
+        self.after(0, lambda: self._daemon_connected(client, events))
+
+    def _daemon_connected(self, client, events):
+        global daemon_client
+        daemon_client = client
+        self.daemon_events = events
+        if client is not None:
+            self.status_label.configure(text=f"Connected to the alias daemon on {client.path}.")
+        else:
+            self.settings_watcher = SettingsWatcher(lambda: self.after(0, self._settings_changed_on_disk))
+            self.settings_watcher.start()
+        self.editor_view.load_aliases()
+
+    def _first_paint(self, event):
+        if event.widget is not self or self.startup_painted:
+            return
+        self.startup_painted = True
+        self.update_idletasks()  # Flush the pending drawing so the number means "on screen"
+        if timing.enabled:
+            timing.record('startup.first_paint', time.perf_counter() - STARTED)
+
+    def _first_aliases_loaded(self):
+        if timing.enabled:
+            timing.record('startup.aliases_loaded', time.perf_counter() - STARTED)
+
+    def _show_timing(self, name, seconds, nbytes):
+        # Per-file sync spans would drown out everything else
+        if name.startswith('sync.') or not self.winfo_exists():
+            return
+        text = self.status_label.cget("text").split(TIMING_SEPARATOR)[0]
+        self.status_label.configure(text=f"{text}{TIMING_SEPARATOR}{timing.format_span(name, seconds, nbytes)}")
+
+    def destroy(self):
+        # Never lose a queued save on exit. Its callbacks would touch widgets
+        # about to be destroyed, so only the write itself is waited for.
+        settings_writer.discard_callbacks()
+        settings_writer.flush(CLOSE_FLUSH_TIMEOUT)
+        if self.settings_watcher is not None:
+            self.settings_watcher.stop()
+        if self.daemon_events is not None:
+            self.daemon_events.close()
+        super().destroy()
+
+    def _settings_changed_on_disk(self):
+        if self.editor_view.winfo_viewable():
+            self.editor_view.reload_from_disk()
+        source = "Aliases changed outside this window" if daemon_client is not None else "settings.json changed on disk"
+        self.status_label.configure(text=f"{source}. Aliases reloaded.")
 
     def copy_base64_event(self):
         """Generates Base64 string from current settings and copies to clipboard."""
@@ -349,77 +1064,101 @@ class TowerAliasManager(ctk.CTk):
             return
 
         try:
-            # 1. Convert dict to JSON string
-            json_str = json.dumps(current_data)
-            
-            # 2. Encode to Base64
-            b64_str = base64.b64encode(json_str.encode('utf-8')).decode('utf-8')
+            # 1. Encode to a compressed, checksummed share string
+            with timing.span('dump_alias') as s:
+                b64_str = encode_share_string(current_data)
+                s.add_bytes(len(b64_str))
             
-            # 3. Copy to Clipboard
+            # 2. Copy to Clipboard
             self.clipboard_clear()
             self.clipboard_append(b64_str)
             self.update() # Required to finalize the clipboard event
             
-            # 4. Notify User
-            tkmb.showinfo("Copied!", "Base64 configuration string copied to clipboard.")
-            self.status_label.configure(text="Copied Base64 string to clipboard.")
+            # 3. Notify User
+            tkmb.showinfo("Copied!", "Share string copied to clipboard.")
+            self.status_label.configure(text=f"Copied share string to clipboard ({len(b64_str)} characters).")
             
         except Exception as e:
             tkmb.showerror("Error", f"Failed to encode/copy: {e}")
 
+    def history_event(self):
+        def on_restored(success, msg):
+            if success:
+                self.status_label.configure(text="Aliases restored from history.")
+                if self.editor_view.winfo_viewable():
+                    self.editor_view.load_aliases()
+            else:
+                tkmb.showerror("Error", f"Restore failed: {msg}")
+        HistoryDialog(self, on_restored)
+
     def show_editor(self):
-        self.library_view.grid_forget()
+        if self.library_view is not None:
+            self.library_view.grid_forget()
         self.editor_view.grid(row=0, column=0, sticky="nsew")
         self.editor_view.load_aliases()
         self.status_label.configure(text="Editor Mode")
 
     def show_library(self):
+        if self.library_view is None:
+            with timing.span('build_library_view'):
+                self.library_view = LibraryFrame(self.main_container)
         self.editor_view.grid_forget()
         self.library_view.grid(row=0, column=0, sticky="nsew")
         self.library_view.refresh_list()
         self.status_label.configure(text="Library Mode")
 
     def sync_github(self):
+        # While a sync is running the button doubles as its cancel switch
+        if self.sync_cancel_event is not None:
+            self.sync_cancel_event.set()
+            self.status_label.configure(text="Cancelling sync...")
+            self.btn_sync.configure(state="disabled")
+            return
+
         self.status_label.configure(text="Contacting GitHub...")
-        self.btn_sync.configure(state="disabled")
-        threading.Thread(target=self._run_sync).start()
+        self.sync_cancel_event = threading.Event()
+        self.btn_sync.configure(text="Cancel Sync")
+        threading.Thread(target=self._run_sync, args=(self.sync_cancel_event,), daemon=True).start()
 
-    def _run_sync(self):
-        try:
-            lib_path = Path('library')
-            if not lib_path.exists(): lib_path.mkdir()
+    def _run_sync(self, cancel_event):
+        from library_sync import SYNC_MODE, sync_library
 
-            session = requests.Session()
-            url = "https://api.github.com/repos/iiEpic/tower-networking-alias-manager/git/trees/46741b60579bf645139403109d3d1a6ee2a8ef76?recursive=1"
-            
-            data = session.get(url).json()
-            count = 0
-            for file in [i for i in data.get("tree", []) if i['path'].startswith('library/')]:
-                blob = session.get(file['url']).json()
-                content = base64.b64decode(blob['content']).decode('utf-8')
-                
-                local_path = lib_path / file['path'].replace('library/', '')
-                
-                if local_path.suffix == '.txt':
-                    try:
-                        json_content = json.loads(base64.b64decode(content).decode('utf-8'))
-                        local_path = local_path.with_suffix('.json')
-                        with open(local_path, 'w') as f: json.dump(json_content, f, indent=4)
-                        count += 1
-                    except: pass
-                elif local_path.suffix == '.json':
-                    with open(local_path, 'w') as f: f.write(content)
-                    count += 1
-
-            self.after(0, lambda: self._sync_complete(f"Sync complete. Updated {count} files."))
+        def report(done, total, path, error):
+            name = path.replace('library/', '', 1)
+            count = f"{done}/{total}" if total else f"{done} files"
+            text = f"Syncing library... {count} ({name})" if not error else f"Syncing library... {count} (skipped {name})"
+            self.after(0, lambda: self.status_label.configure(text=text))
+
+        try:
+            with timing.span('sync_library'):
+                result = sync_library(progress=report, cancel_event=cancel_event)
+            if result.not_modified:
+                msg = "Sync complete. Library is already up to date."
+            elif SYNC_MODE == 'metadata':
+                msg = f"Sync complete. Listed {result.total} libraries; each downloads when you open it."
+            elif result.cancelled:
+                msg = f"Sync cancelled. Updated {len(result.updated)} of {result.total} files."
+            else:
+                msg = f"Sync complete. Updated {len(result.updated)} files, {result.unchanged} unchanged, {len(result.removed)} removed."
+                if result.skipped:
+                    msg += f" Skipped {len(result.skipped)} invalid files."
+            rejected = [report for report in result.reports if not report.valid]
+            self.after(0, lambda: self._sync_complete(msg, rejected))
         except Exception as e:
             self.after(0, lambda: self._sync_complete(f"Sync Failed: {str(e)}"))
 
-    def _sync_complete(self, msg):
+    def _sync_complete(self, msg, rejected=()):
+        self.sync_cancel_event = None
         self.status_label.configure(text=msg)
-        self.btn_sync.configure(state="normal")
-        if self.library_view.winfo_viewable():
+        self.btn_sync.configure(state="normal", text="Sync GitHub")
+        if self.library_view is not None and self.library_view.winfo_viewable():
             self.library_view.refresh_list()
+        if rejected:
+            # Rejected files are remembered, so this only comes up when a submission changes
+            lines = [f"{report.path}: {report.error}" for report in rejected[:SYNC_REPORT_LIMIT]]
+            if len(rejected) > SYNC_REPORT_LIMIT:
+                lines.append(f"...and {len(rejected) - SYNC_REPORT_LIMIT} more")
+            tkmb.showwarning("Skipped library files", "These submissions could not be imported:\n\n" + "\n".join(lines))
 
     def view_base64_event(self):
         # Create Popup Window
@@ -427,12 +1166,19 @@ class TowerAliasManager(ctk.CTk):
         window.title("Base64 Viewer & Importer")
         window.geometry("600x650")
         window.transient(self) # Keep on top of main window
+
+        def on_close():
+            # Stop any decode still running for this window
+            if getattr(window, 'decode_cancel', None):
+                window.decode_cancel.set()
+            window.destroy()
+        window.protocol("WM_DELETE_WINDOW", on_close)
         
         window.grid_columnconfigure(0, weight=1)
         window.grid_rowconfigure(3, weight=1)
 
         # 1. Input
-        lbl_in = ctk.CTkLabel(window, text="Paste Base64 String:", anchor="w", font=ctk.CTkFont(weight="bold"))
+        lbl_in = ctk.CTkLabel(window, text="Paste Share String (or legacy Base64):", anchor="w", font=ctk.CTkFont(weight="bold"))
         lbl_in.grid(row=0, column=0, padx=20, pady=(15, 5), sticky="ew")
         
         txt_input = ctk.CTkTextbox(window, height=100)
@@ -456,37 +1202,81 @@ class TowerAliasManager(ctk.CTk):
         b64_text = in_widget.get("0.0", "end-1c").strip()
         if not b64_text: return
 
+        # A new decode supersedes any that is still running for this window
+        window = import_btn.winfo_toplevel()
+        if getattr(window, 'decode_cancel', None):
+            window.decode_cancel.set()
+        cancel = window.decode_cancel = threading.Event()
+
+        import_btn.configure(state="disabled")
+        self._set_preview_text(out_widget, "Decoding...")
+        threading.Thread(target=self._decode_worker, args=(b64_text, out_widget, import_btn, cancel), daemon=True).start()
+
+    def _decode_worker(self, b64_text, out_widget, import_btn, cancel):
+        """Decodes and validates off the Tk thread, posting results back with after()."""
+        def post(callback):
+            def run():
+                if not cancel.is_set() and out_widget.winfo_exists():
+                    callback()
+            self.after(0, run)
+
+        try:
+            # Attempt Decode (share string or legacy Base64)
+            with timing.span('decode_share_string', len(b64_text)):
+                data = decode_share_string(b64_text, cancel_event=cancel,
+                                           progress=lambda f: post(lambda: self._set_preview_text(out_widget, f"Decoding... {f:.0%}")))
+                pretty_lines = json.dumps(data, indent=4).splitlines(keepends=True)
+        except DecodeCancelled:
+            return
+        except ShareCodecError as e:
+            post(lambda: self._show_decode_error(out_widget, import_btn, e))
+            return
+
+        post(lambda: self._show_decoded(data, pretty_lines, out_widget, import_btn, cancel))
+
+    def _set_preview_text(self, out_widget, text):
         out_widget.configure(state="normal")
         out_widget.delete("0.0", "end")
-        
-        try:
-            # Attempt Decode
-            json_str = base64.b64decode(b64_text).decode('utf-8')
-            data = json.loads(json_str)
-            
-            # Show Pretty JSON
-            out_widget.insert("0.0", json.dumps(data, indent=4))
-            
-            # Enable Import Button
-            import_btn.configure(state="normal", command=lambda: self._import_b64_data(data, import_btn.winfo_toplevel()))
-            
-        except Exception as e:
-            out_widget.insert("0.0", f"DECODE ERROR:\n{e}\n\nPlease check your string and try again.")
-            import_btn.configure(state="disabled")
-        
+        out_widget.insert("0.0", text)
+        out_widget.configure(state="disabled")
+
+    def _show_decode_error(self, out_widget, import_btn, error):
+        self._set_preview_text(out_widget, f"DECODE ERROR:\n{error}\n\nPlease check your string and try again.")
+        import_btn.configure(state="disabled")
+
+    def _show_decoded(self, data, pretty_lines, out_widget, import_btn, cancel):
+        # Validation is done, so importing is safe even while the preview fills in
+        import_btn.configure(state="normal", command=lambda: self._import_b64_data(data, import_btn.winfo_toplevel()))
+        self._set_preview_text(out_widget, "")
+        self._fill_preview(out_widget, pretty_lines, 0, cancel)
+
+    def _fill_preview(self, out_widget, lines, start, cancel):
+        """Appends the pretty-printed JSON a slice at a time so the window stays responsive."""
+        if cancel.is_set() or not out_widget.winfo_exists():
+            return
+        end = start + PREVIEW_CHUNK_LINES
+        out_widget.configure(state="normal")
+        out_widget.insert("end", ''.join(lines[start:end]))
         out_widget.configure(state="disabled")
+        if end < len(lines):
+            self.after(1, lambda: self._fill_preview(out_widget, lines, end, cancel))
 
     def _import_b64_data(self, data, window):
-        if tkmb.askyesno("Confirm Import", "This will overwrite your current aliases with the data above.\nAre you sure?"):
-            success, msg = save_settings_to_disk(data)
+        def on_saved(success, msg):
             if success:
                 tkmb.showinfo("Success", "Aliases imported successfully!")
-                window.destroy() # Close popup
+                if window.winfo_exists():
+                    window.destroy() # Close popup
                 if self.editor_view.winfo_viewable():
                     self.editor_view.load_aliases() # Refresh main UI
             else:
                 tkmb.showerror("Error", f"Save failed: {msg}")
+        MergeDialog(window, data, "pasted string", on_saved)
 
 if __name__ == "__main__":
+    import multiprocessing
+    # Library decode workers re-run this file in frozen builds; this keeps them from opening a window
+    multiprocessing.freeze_support()
+    timing.configure(sys.argv)
     app = TowerAliasManager()
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+import json
+
+# --- LIBRARY PREVIEW MODEL ---
+# Parses a library once, keeps recent ones in an LRU cache and renders only the
+# page of aliases the user is looking at.
+
+PAGE_SIZE = 200
+CACHE_SIZE = 16
+
+
+def format_size(size: int):
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def format_summary(info: dict):
+    return f"{info['alias_count']} aliases, {info['command_count']} commands, {format_size(info['size'])}"
+
+
+class LibraryPreview:
+    """One parsed library, rendered page by page.
+
+    Concatenating every page gives the same text as json.dumps(aliases, indent=4).
+    """
+
+    def __init__(self, name: str, aliases: dict):
+        self.name = name
+        self.aliases = aliases
+        self.keys = list(aliases)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def render_page(self, start: int, count: int = PAGE_SIZE):
+        """Text for aliases[start:start + count], including the braces at either end."""
+        if not self.keys:
+            return "{}" if start == 0 else ""
+
+        end = min(start + count, len(self.keys))
+        lines = []
+        if start == 0:
+            lines.append("{\n")
+        for i in range(start, end):
+            key = self.keys[i]
+            comma = "," if i < len(self.keys) - 1 else ""
+            lines.append(f"    {json.dumps(key)}: {json.dumps(self.aliases[key])}{comma}\n")
+        if end == len(self.keys):
+            lines.append("}")
+        return ''.join(lines)
+
+
+class PreviewCache:
+    """LRU of LibraryPreview objects, keyed on (name, sha) so a sync invalidates stale entries."""
+
+    def __init__(self, store, maxsize: int = CACHE_SIZE):
+        self.store = store
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def get(self, name: str):
+        key = (name, self.store.get_info(name)['sha'])
+        preview = self.entries.get(key)
+        if preview is not None:
+            self.entries.move_to_end(key)
+            return preview
+
+        preview = LibraryPreview(name, self.store.get_aliases(name))
+        self.entries[key] = preview
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return preview
+
+    def clear(self):
+        self.entries.clear()
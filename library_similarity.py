@@ -0,0 +1,140 @@
+import hashlib
+import random
+import struct
+
+# --- NEAR-DUPLICATE LIBRARIES ---
+# Each library is reduced to a MinHash signature over its (name, command)
+# pairs, computed once at ingest time. Signatures are cut into LSH bands;
+# libraries sharing any band are candidates, and only candidates are compared.
+# With 16 bands of 4 rows, a pair at 70% Jaccard similarity shares a band
+# 99% of the time and a pair at 20% only 2.5% of the time.
+#
+# The NUM_PERM permutations are a universal hash family, (a*x + b) mod p with
+# p = 2**61 - 1 and random a, b, applied to each shingle's 56-bit hash. The
+# banding figures above assume the permutations are independent, which this
+# family approximates closely enough for 64 of them.
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+DUPLICATE_THRESHOLD = 0.7  # estimated Jaccard similarity for "near-duplicate"
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x7A11A5)  # fixed seed: signatures are stored, so they must be reproducible
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(NUM_PERM)]
+_SIGNATURE = struct.Struct(f'<{NUM_PERM}Q')
+
+
+def shingles(aliases: dict):
+    """One 56-bit hash per (name, command) pair; below _PRIME, as the hash family requires."""
+    return {int.from_bytes(hashlib.blake2b(f"{k}\0{v}".encode('utf-8'), digest_size=7).digest(), 'little')
+            for k, v in aliases.items()}
+
+
+def minhash(aliases: dict):
+    """The library's MinHash signature as a tuple of NUM_PERM ints."""
+    values = shingles(aliases)
+    if not values:
+        return (_PRIME,) * NUM_PERM  # larger than any real minimum
+    return tuple(min([(a * x + b) % _PRIME for x in values]) for a, b in _PERMUTATIONS)
+
+
+def pack_signature(signature):
+    return _SIGNATURE.pack(*signature)
+
+
+def unpack_signature(blob: bytes):
+    return _SIGNATURE.unpack(blob)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two libraries' (name, command) sets."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+
+class SimilarityIndex:
+    """LSH buckets over library signatures."""
+
+    def __init__(self, signatures: dict = None):
+        self.signatures = {}
+        self.buckets = {}  # (band, band values) -> {names}
+        for name, signature in (signatures or {}).items():
+            self.add(name, signature)
+
+    def _bands(self, signature):
+        return [(band, signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+    def add(self, name: str, signature):
+        self.remove(name)
+        self.signatures[name] = signature
+        for key in self._bands(signature):
+            self.buckets.setdefault(key, set()).add(name)
+
+    def remove(self, name: str):
+        signature = self.signatures.pop(name, None)
+        if signature is None:
+            return
+        for key in self._bands(signature):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(name)
+                if not bucket:
+                    del self.buckets[key]
+
+    def similar(self, name: str, threshold: float = DUPLICATE_THRESHOLD):
+        """[(other, similarity)] most similar first. Raises KeyError for an unknown library."""
+        signature = self.signatures[name]
+        candidates = set()
+        for key in self._bands(signature):
+            candidates |= self.buckets.get(key, set())
+        candidates.discard(name)
+        scored = ((other, similarity(signature, self.signatures[other])) for other in candidates)
+        return sorted((pair for pair in scored if pair[1] >= threshold), key=lambda pair: (-pair[1], pair[0]))
+
+    def clusters(self, threshold: float = DUPLICATE_THRESHOLD):
+        """Groups of two or more near-duplicate libraries, each sorted by name.
+
+        Only pairs sharing a bucket are compared; groups are the connected
+        components of the pairs that pass the threshold.
+        """
+        parent = {}
+
+        def find(name):
+            root = name
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while name != root:
+                parent[name], name = root, parent.get(name, name)
+            return root
+
+        for bucket in self.buckets.values():
+            if len(bucket) < 2:
+                continue
+            members = sorted(bucket)
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    root_a, root_b = find(a), find(b)
+                    # Already grouped through another pair: no need to compare
+                    if root_a != root_b and similarity(self.signatures[a], self.signatures[b]) >= threshold:
+                        parent.setdefault(root_a, root_a)
+                        parent[root_b] = root_a
+
+        groups = {}
+        for name in parent:
+            groups.setdefault(find(name), set()).add(name)
+        return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=lambda g: g[0])
+
+
+def collapse(names, counts: dict, clusters):
+    """Keeps one of names per cluster (the one with most aliases); returns (kept names, {kept: hidden names})."""
+    present = set(names)
+    hidden = {}
+    drop = set()
+    for group in clusters:
+        group = [name for name in group if name in present]
+        if len(group) < 2:
+            continue
+        keep = min(group, key=lambda name: (-counts.get(name, 0), name))
+        hidden[keep] = [name for name in group if name != keep]
+        drop.update(hidden[keep])
+    return [name for name in names if name not in drop], hidden
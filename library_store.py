@@ -0,0 +1,367 @@
+from pathlib import Path
+import hashlib
+import json
+import sqlite3
+
+from library_similarity import SimilarityIndex, minhash, pack_signature, unpack_signature
+
+# --- LOCAL LIBRARY STORE ---
+# Every synced library is ingested into one SQLite database so the GUI and CLI
+# can list, filter and search all contributors' aliases without parsing JSON.
+#
+# The store is content addressed: each distinct alias body is kept once in
+# `bodies`, keyed by its hash, and a library is just a list of name -> body.
+# Popular aliases shared by many contributors cost one row, not one per copy.
+
+LIBRARY_DIR = Path('library')
+DB_NAME = 'library.db'
+SCHEMA_VERSION = 3  # 2: bodies shared between libraries; 3: MinHash over a universal hash family
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bodies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash BLOB NOT NULL UNIQUE,
+    command TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS libraries (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    sha TEXT,
+    alias_count INTEGER NOT NULL,
+    command_count INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    library_id INTEGER NOT NULL REFERENCES libraries(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    body_id INTEGER NOT NULL REFERENCES bodies(id),
+    UNIQUE (library_id, name)
+);
+CREATE TABLE IF NOT EXISTS signatures (
+    library_id INTEGER PRIMARY KEY REFERENCES libraries(id) ON DELETE CASCADE,
+    minhash BLOB NOT NULL
+);
+-- Upstream listing from a metadata-only sync; content is fetched per library on demand
+CREATE TABLE IF NOT EXISTS remote_files (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    url TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS aliases_by_name ON aliases(name);
+CREATE INDEX IF NOT EXISTS aliases_by_body ON aliases(body_id);
+"""
+
+# Names and bodies are indexed separately so each body is tokenised once
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS names_fts USING fts5(
+    name, content='aliases', content_rowid='rowid', tokenize="unicode61 tokenchars '_-'"
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS bodies_fts USING fts5(
+    command, content='bodies', content_rowid='id', tokenize="unicode61 tokenchars '_-'"
+);
+CREATE TRIGGER IF NOT EXISTS aliases_ai AFTER INSERT ON aliases BEGIN
+    INSERT INTO names_fts(rowid, name) VALUES (new.rowid, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS aliases_ad AFTER DELETE ON aliases BEGIN
+    INSERT INTO names_fts(names_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS bodies_ai AFTER INSERT ON bodies BEGIN
+    INSERT INTO bodies_fts(rowid, command) VALUES (new.id, new.command);
+END;
+CREATE TRIGGER IF NOT EXISTS bodies_ad AFTER DELETE ON bodies BEGIN
+    INSERT INTO bodies_fts(bodies_fts, rowid, command) VALUES ('delete', old.id, old.command);
+END;
+"""
+
+# Tables from the version 1 layout, which stored every command per library
+LEGACY_TABLES = ('aliases_fts', 'aliases', 'libraries')
+
+
+def body_hash(command: str):
+    return hashlib.blake2b(command.encode('utf-8'), digest_size=16).digest()
+
+
+def alias_map(data):
+    """Library files are either a bare alias map or {'plaintext': {...}}."""
+    if isinstance(data, dict) and isinstance(data.get('plaintext'), dict):
+        data = data['plaintext']
+    if not isinstance(data, dict):
+        raise ValueError("Library does not contain an alias map.")
+    return {str(k): v if isinstance(v, str) else json.dumps(v) for k, v in data.items()}
+
+
+class LibraryStore:
+    """SQLite-backed index of every library file, with full-text search.
+
+    Falls back to LIKE queries if this sqlite3 build has no FTS5.
+    """
+
+    def __init__(self, lib_path: Path = LIBRARY_DIR):
+        lib_path.mkdir(exist_ok=True)
+        self.lib_path = lib_path
+        db_path = lib_path / DB_NAME
+        is_new = not db_path.exists()
+        # hash -> command, shared by every library loaded through this store
+        self.bodies = {}
+        self.needs_prune = False
+        self.similarity = None  # SimilarityIndex, built on first use
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        legacy = None
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if not is_new and version < 2:
+            legacy = self._drop_legacy_schema()
+        elif not is_new and version < SCHEMA_VERSION:
+            # Signatures from older permutations don't compare with new ones; similarity_index() recomputes them
+            self.conn.execute("DROP TABLE IF EXISTS signatures")
+
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+
+        if legacy:
+            for name, sha, aliases in legacy:
+                self.ingest(name, aliases, sha=sha, commit=False)
+            self.conn.commit()
+        elif is_new:
+            self.rebuild_from_files()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.commit()
+        else:
+            self.conn.rollback()
+        self.close()
+
+    def _drop_legacy_schema(self):
+        """Reads every library out of a version 1 database and drops its tables."""
+        libraries = []
+        try:
+            rows = self.conn.execute("SELECT id, name, sha FROM libraries").fetchall()
+            for library_id, name, sha in rows:
+                aliases = dict(self.conn.execute(
+                    "SELECT name, command FROM aliases WHERE library_id = ? ORDER BY rowid", (library_id,)))
+                libraries.append((name, sha, aliases))
+        except sqlite3.OperationalError:
+            pass
+        for table in LEGACY_TABLES:
+            self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+        self.conn.commit()
+        return libraries
+
+    # --- Writing ---
+
+    def ingest(self, name: str, data, sha: str = None, commit: bool = True):
+        """Replaces the stored copy of one library."""
+        aliases = alias_map(data)
+        command_count = sum(len([c for c in v.split(';') if c.strip()]) for v in aliases.values())
+        size = sum(len(k) + len(v) for k, v in aliases.items())
+        hashes = {command: body_hash(command) for command in set(aliases.values())}
+
+        if self.conn.execute("DELETE FROM libraries WHERE name = ?", (name,)).rowcount:
+            self.needs_prune = True
+        self.conn.executemany("INSERT OR IGNORE INTO bodies (hash, command) VALUES (?, ?)",
+                              ((digest, command) for command, digest in hashes.items()))
+        cur = self.conn.execute(
+            "INSERT INTO libraries (name, sha, alias_count, command_count, size) VALUES (?, ?, ?, ?, ?)",
+            (name, sha, len(aliases), command_count, size))
+        library_id = cur.lastrowid
+        self.conn.executemany(
+            "INSERT INTO aliases (library_id, name, body_id) SELECT ?, ?, id FROM bodies WHERE hash = ?",
+            ((library_id, k, hashes[v]) for k, v in aliases.items()))
+        signature = minhash(aliases)
+        self.conn.execute("INSERT INTO signatures (library_id, minhash) VALUES (?, ?)",
+                          (library_id, pack_signature(signature)))
+        if self.similarity is not None:
+            self.similarity.add(name, signature)
+        if commit:
+            self.commit()
+
+    def set_remote_files(self, entries, commit: bool = True):
+        """Replaces the upstream listing with [(name, path, sha, size, url)]."""
+        self.conn.execute("DELETE FROM remote_files")
+        self.conn.executemany("INSERT OR REPLACE INTO remote_files (name, path, sha, size, url) VALUES (?, ?, ?, ?, ?)",
+                              entries)
+        if commit:
+            self.commit()
+
+    def remove(self, name: str, commit: bool = True):
+        if self.conn.execute("DELETE FROM libraries WHERE name = ?", (name,)).rowcount:
+            self.needs_prune = True
+        if self.similarity is not None:
+            self.similarity.remove(name)
+        if commit:
+            self.commit()
+
+    def commit(self):
+        """Commits, first dropping any bodies no library refers to any more."""
+        if self.needs_prune:
+            self.conn.execute("DELETE FROM bodies WHERE NOT EXISTS "
+                              "(SELECT 1 FROM aliases WHERE aliases.body_id = bodies.id)")
+            self.needs_prune = False
+        self.conn.commit()
+
+    def rebuild_from_files(self):
+        """Ingests any library/*.json already on disk (e.g. from an older sync)."""
+        for path in sorted(self.lib_path.glob('*.json')):
+            if path.name.startswith('.'):
+                continue
+            try:
+                with open(path, 'r') as f:
+                    self.ingest(path.name, json.load(f), commit=False)
+            except (OSError, ValueError):
+                continue
+        self.commit()
+
+    # --- Reading ---
+
+    def list_libraries(self, name_filter: str = ""):
+        """[(name, alias_count)] sorted by name, optionally filtered by name.
+
+        Libraries listed by a metadata-only sync but not downloaded yet have an alias_count of None.
+        """
+        pattern = f"%{_escape_like(name_filter)}%"
+        return self.conn.execute(
+            "SELECT name, alias_count FROM libraries WHERE name LIKE ? ESCAPE '\\' "
+            f"UNION ALL {_NOT_DOWNLOADED} AND r.name LIKE ? ESCAPE '\\' ORDER BY name",
+            (pattern, pattern)).fetchall()
+
+    def get_info(self, name: str):
+        """{'alias_count', 'command_count', 'size', 'sha'} for one library, without loading it."""
+        row = self.conn.execute(
+            "SELECT alias_count, command_count, size, sha FROM libraries WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return dict(zip(('alias_count', 'command_count', 'size', 'sha'), row))
+
+    def library_names(self):
+        """Names of the libraries whose content is in the store."""
+        return {name for name, in self.conn.execute("SELECT name FROM libraries")}
+
+    def remote_file(self, name: str):
+        """{'path', 'sha', 'size', 'url'} from the last metadata-only sync, or None."""
+        row = self.conn.execute("SELECT path, sha, size, url FROM remote_files WHERE name = ?", (name,)).fetchone()
+        return None if row is None else dict(zip(('path', 'sha', 'size', 'url'), row))
+
+    def is_downloaded(self, name: str):
+        """False for a library that is only listed, with its content still on GitHub."""
+        return self.conn.execute("SELECT 1 FROM libraries WHERE name = ?", (name,)).fetchone() is not None
+
+    def get_aliases(self, name: str):
+        """The library's alias map. Bodies are shared between every map this store returns."""
+        rows = self.conn.execute(
+            "SELECT a.name, b.hash, b.command FROM aliases a JOIN libraries l ON l.id = a.library_id "
+            "JOIN bodies b ON b.id = a.body_id WHERE l.name = ? ORDER BY a.rowid", (name,)).fetchall()
+        if not rows and not self.conn.execute("SELECT 1 FROM libraries WHERE name = ?", (name,)).fetchone():
+            raise KeyError(name)
+        bodies = self.bodies
+        return {alias: bodies.setdefault(digest, command) for alias, digest, command in rows}
+
+    def stats(self):
+        """{'libraries', 'aliases', 'unique_bodies'}: how much the store deduplicates."""
+        counts = [self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ('libraries', 'aliases', 'bodies')]
+        return dict(zip(('libraries', 'aliases', 'unique_bodies'), counts))
+
+    def similarity_index(self):
+        """The SimilarityIndex over every library, kept up to date by ingest() and remove().
+
+        Libraries stored before signatures existed get theirs computed here, once.
+        """
+        if self.similarity is None:
+            missing = self.conn.execute(
+                "SELECT l.id, l.name FROM libraries l LEFT JOIN signatures s ON s.library_id = l.id "
+                "WHERE s.library_id IS NULL").fetchall()
+            if missing:
+                self.conn.executemany(
+                    "INSERT INTO signatures (library_id, minhash) VALUES (?, ?)",
+                    [(library_id, pack_signature(minhash(self.get_aliases(name)))) for library_id, name in missing])
+                self.conn.commit()
+            rows = self.conn.execute("SELECT l.name, s.minhash FROM libraries l JOIN signatures s ON s.library_id = l.id")
+            self.similarity = SimilarityIndex({name: unpack_signature(blob) for name, blob in rows})
+        return self.similarity
+
+    def similar_libraries(self, name: str, threshold: float = None):
+        """[(library, estimated similarity)] near-duplicates of one library. Raises KeyError if unknown."""
+        index = self.similarity_index()
+        return index.similar(name) if threshold is None else index.similar(name, threshold)
+
+    def duplicate_clusters(self, threshold: float = None):
+        """Groups of near-duplicate libraries, found without comparing every pair."""
+        index = self.similarity_index()
+        return index.clusters() if threshold is None else index.clusters(threshold)
+
+    def _alias_hits(self, query: str):
+        """SQL and parameters selecting (alias rowid, rank) for aliases matching query."""
+        if self.has_fts:
+            phrase = '"' + query.replace('"', '""') + '"'
+            sql = ("SELECT rowid, MIN(rank) AS rank FROM ("
+                   "SELECT f.rowid AS rowid, f.rank AS rank FROM names_fts f WHERE names_fts MATCH ? "
+                   "UNION ALL "
+                   "SELECT a.rowid, f.rank FROM bodies_fts f JOIN aliases a ON a.body_id = f.rowid "
+                   "WHERE bodies_fts MATCH ?) GROUP BY rowid")
+            return sql, (phrase, phrase)
+
+        pattern = f"%{_escape_like(query)}%"
+        sql = ("SELECT a.rowid AS rowid, 0 AS rank FROM aliases a JOIN bodies b ON b.id = a.body_id "
+               "WHERE a.name LIKE ? ESCAPE '\\' OR b.command LIKE ? ESCAPE '\\'")
+        return sql, (pattern, pattern)
+
+    def search(self, query: str, limit: int = 200):
+        """[(library, alias, command)] whose alias name or commands match query.
+
+        query is matched as a phrase, so 'firewall show' finds that exact usage.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        hits_sql, params = self._alias_hits(query)
+        sql = (f"WITH hits(rowid, rank) AS ({hits_sql}) "
+               "SELECT l.name, a.name, b.command FROM hits h JOIN aliases a ON a.rowid = h.rowid "
+               "JOIN bodies b ON b.id = a.body_id JOIN libraries l ON l.id = a.library_id "
+               "ORDER BY h.rank LIMIT ?")
+        return self.conn.execute(sql, params + (limit,)).fetchall()
+
+    def libraries_matching(self, query: str):
+        """[(name, alias_count, hits)] for libraries whose name or aliases match query."""
+        query = query.strip()
+        if not query:
+            return [(name, count, 0) for name, count in self.list_libraries()]
+
+        alias_sql, params = self._alias_hits(query)
+        hits_sql = (f"SELECT a.library_id, COUNT(*) FROM ({alias_sql}) m "
+                    "JOIN aliases a ON a.rowid = m.rowid GROUP BY a.library_id")
+
+        # Libraries not downloaded yet can only match by name
+        pattern = f"%{_escape_like(query)}%"
+        sql = (f"WITH hits(library_id, n) AS ({hits_sql}) "
+               "SELECT l.name, l.alias_count, COALESCE(h.n, 0) FROM libraries l "
+               "LEFT JOIN hits h ON h.library_id = l.id "
+               "WHERE h.n IS NOT NULL OR l.name LIKE ? ESCAPE '\\' "
+               f"UNION ALL SELECT name, alias_count, 0 FROM ({_NOT_DOWNLOADED} AND r.name LIKE ? ESCAPE '\\') "
+               "ORDER BY 3 DESC, 1")
+        return self.conn.execute(sql, params + (pattern, pattern)).fetchall()
+
+
+# Listed upstream, but with no content in the store
+_NOT_DOWNLOADED = ("SELECT r.name AS name, NULL AS alias_count FROM remote_files r "
+                   "WHERE NOT EXISTS (SELECT 1 FROM libraries l WHERE l.name = r.name)")
+
+
+def _escape_like(text: str):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
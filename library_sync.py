@@ -0,0 +1,607 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+import base64
+import hashlib
+import json
+import multiprocessing
+import os
+import tarfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from library_store import LibraryStore, alias_map
+from share_codec import ShareCodecError, decode_share_string
+from timing import span
+
+# --- SHARED LIBRARY SYNC ENGINE ---
+# Used by both the CLI (pull_new_files) and the GUI (TowerAliasManager._run_sync).
+
+BRANCH = "main"
+# The trees endpoint resolves a branch name to that branch's current tree.
+TREE_URL = f"https://api.github.com/repos/iiEpic/tower-networking-alias-manager/git/trees/{BRANCH}?recursive=1"
+LIBRARY_DIR = Path('library')
+ARCHIVE_URL = f"https://codeload.github.com/iiEpic/tower-networking-alias-manager/tar.gz/refs/heads/{BRANCH}"
+MANIFEST_NAME = '.manifest.json'
+# Raw submissions downloaded on demand, stored under their blob SHA
+BLOB_CACHE_DIR = '.blobs'
+# 'api' fetches the tree and changed blobs, 'archive' streams one tarball,
+# 'metadata' only lists the tree and leaves content to fetch_library
+SYNC_MODE = os.environ.get('TOWER_ALIAS_SYNC_MODE', 'api')
+MAX_WORKERS = 8
+REQUEST_TIMEOUT = 30
+# Decoding happens in worker processes once there is enough of it to pay for starting them
+DECODE_WORKERS = os.cpu_count() or 1
+MIN_FILES_FOR_PROCESSES = 8
+
+
+class SyncCancelled(Exception):
+    pass
+
+
+@dataclass
+class FileReport:
+    """What happened to one library submission during a sync."""
+    path: str
+    local_name: str = None
+    valid: bool = False
+    size: int = 0
+    alias_count: int = 0
+    error: str = None
+
+
+@dataclass
+class SyncResult:
+    total: int = 0
+    updated: list = field(default_factory=list)
+    skipped: dict = field(default_factory=dict)
+    reports: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    unchanged: int = 0
+    not_modified: bool = False
+    cancelled: bool = False
+
+
+def load_manifest(lib_path: Path = LIBRARY_DIR):
+    """Reads the path -> blob SHA manifest written by the last sync."""
+    try:
+        with open(lib_path / MANIFEST_NAME, 'r') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'etag': None, 'tree_sha': None, 'files': {}}
+
+    manifest.setdefault('etag', None)
+    manifest.setdefault('tree_sha', None)
+    manifest.setdefault('files', {})
+    return manifest
+
+
+def save_manifest(manifest: dict, lib_path: Path = LIBRARY_DIR):
+    manifest_path = lib_path / MANIFEST_NAME
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _manifest_is_complete(manifest: dict, stored: set):
+    """True if every library the manifest promises is still in the store."""
+    return all(info.get('local') is None or info['local'] in stored
+               for info in manifest['files'].values())
+
+
+def _remove_legacy_files(lib_path: Path, manifest: dict, stored: set):
+    """Deletes the .json copies older syncs wrote for .txt submissions, once the store holds them.
+
+    .json submissions keep their upstream name, so in a checkout they are
+    the repository's own files and are left alone.
+    """
+    for path, info in manifest['files'].items():
+        local = info.get('local')
+        if local and local in stored and local != Path(path).name:
+            (lib_path / local).unlink(missing_ok=True)
+
+
+def make_session(max_workers: int = MAX_WORKERS):
+    """Builds a Session whose connection pool is large enough for every worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max_workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def local_library_name(path: str):
+    """The name a submission is stored under: share strings (.txt) become .json."""
+    local_filename = Path(path)
+    if local_filename.suffix == '.txt':
+        return local_filename.with_suffix('.json').name
+    return local_filename.name
+
+
+def _library_entries(tree: dict):
+    """The library submissions in a git trees API response."""
+    return [i for i in tree.get("tree", [])
+            if i['path'].startswith('library/') and Path(i['path']).suffix in ('.txt', '.json')]
+
+
+def convert_library_file(filename: str, raw_content: str):
+    """Turns a raw library submission into (local filename, alias data).
+
+    Raises ValueError if the submission cannot be decoded.
+    """
+    local_filename = Path(filename)
+
+    if local_filename.suffix == '.txt':
+        try:
+            final_json = decode_share_string(raw_content)
+        except ShareCodecError as e:
+            raise ValueError(f"Invalid share string: {e}")
+        return local_library_name(filename), final_json
+
+    if local_filename.suffix == '.json':
+        try:
+            return local_filename.name, json.loads(raw_content)
+        except json.JSONDecodeError:
+            raise ValueError("Invalid JSON.")
+
+    raise ValueError(f"Unsupported file type '{local_filename.suffix}'.")
+
+
+def decode_submission(path: str, data: bytes):
+    """Decodes, validates and normalises one submission; returns (FileReport, aliases or None).
+
+    Runs in a worker process, so everything it takes and returns is picklable.
+    """
+    report = FileReport(path, size=len(data))
+    try:
+        local_name, final_json = convert_library_file(path.replace('library/', '', 1), data.decode('utf-8'))
+        aliases = alias_map(final_json)
+    except UnicodeDecodeError:
+        report.error = "File is not UTF-8 text."
+        return report, None
+    except ValueError as e:
+        report.error = str(e)
+        return report, None
+
+    report.local_name = local_name
+    report.valid = True
+    report.alias_count = len(aliases)
+    return report, aliases
+
+
+def make_decode_pool(file_count: int, workers: int = DECODE_WORKERS):
+    """A process pool for decode_submission, or one thread when that wouldn't pay off."""
+    if workers > 1 and file_count >= MIN_FILES_FOR_PROCESSES:
+        try:
+            # Never fork the caller itself: it has network threads (and in the GUI, Tk) running
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            return ProcessPoolExecutor(max_workers=min(workers, file_count),
+                                       mp_context=multiprocessing.get_context(method))
+        except (OSError, NotImplementedError):
+            # No usable multiprocessing here (e.g. a locked-down sandbox)
+            pass
+    return ThreadPoolExecutor(max_workers=1)
+
+
+def _fetch_blob(session, entry, cancel_event):
+    if cancel_event.is_set():
+        raise SyncCancelled()
+
+    with span('sync.fetch') as s:
+        response = session.get(entry['url'], timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        s.add_bytes(len(response.content))
+        blob_data = response.json()
+        return base64.b64decode(blob_data['content'])
+
+
+def _store_decoded(store, result: SyncResult, new_files: dict, report: FileReport, aliases, sha: str):
+    """Ingests one decoded submission and records the outcome in the result and manifest."""
+    result.reports.append(report)
+    if report.valid:
+        with span('sync.file', report.size):
+            store.ingest(report.local_name, aliases, sha=sha, commit=False)
+        result.updated.append(report.local_name)
+        new_files[report.path] = {'sha': sha, 'local': report.local_name}
+    else:
+        # A bad submission stays bad until its blob changes
+        result.skipped[report.path] = report.error
+        new_files[report.path] = {'sha': sha, 'local': None, 'error': report.error}
+
+
+def _remove_library(lib_path: Path, store, local_name: str):
+    (lib_path / local_name).unlink(missing_ok=True)  # Left behind by syncs that wrote JSON files
+    store.remove(local_name, commit=False)
+
+
+def git_blob_sha(data: bytes):
+    """Same SHA the git trees API reports for a blob, so both sync modes share a manifest."""
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def sync_library(progress=None, cancel_event=None, max_workers: int = MAX_WORKERS,
+                 tree_url: str = TREE_URL, lib_path: Path = LIBRARY_DIR, mode: str = None):
+    """Brings the library store up to date with the branch, fetching only changed blobs.
+
+    The tree is requested with the ETag from the last sync, so an unchanged
+    branch costs one 304 and no file writes. Files removed upstream are deleted.
+    Blobs are fetched on a thread pool and decoded on a process pool (see
+    make_decode_pool); result.reports holds a FileReport for every file fetched.
+
+    progress(done, total, path, error) is called once per fetched file from the
+    calling thread. Setting cancel_event stops any fetches that have not started yet.
+    With mode='archive' or 'metadata' (or TOWER_ALIAS_SYNC_MODE) this defers to
+    sync_library_archive or sync_library_metadata.
+    """
+    mode = mode or SYNC_MODE
+    if mode == 'archive':
+        return sync_library_archive(progress=progress, cancel_event=cancel_event, lib_path=lib_path)
+    if mode == 'metadata':
+        return sync_library_metadata(progress=progress, tree_url=tree_url, lib_path=lib_path)
+
+    cancel_event = cancel_event or threading.Event()
+    lib_path.mkdir(exist_ok=True)
+    result = SyncResult()
+    manifest = load_manifest(lib_path)
+
+    store = LibraryStore(lib_path)
+    stored = store.library_names()
+    store.set_remote_files([], commit=False)  # a full sync supersedes any metadata-only listing
+    _remove_legacy_files(lib_path, manifest, stored)
+    headers = {}
+    if manifest['etag'] and _manifest_is_complete(manifest, stored):
+        headers['If-None-Match'] = manifest['etag']
+
+    session = make_session(max_workers)
+    try:
+        response = session.get(tree_url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304:
+            result.not_modified = True
+            result.unchanged = len(manifest['files'])
+            return result
+        response.raise_for_status()
+
+        data = response.json()
+        entries = _library_entries(data)
+        old_files = manifest['files']
+        new_files = {}
+
+        to_fetch = []
+        for entry in entries:
+            known = old_files.get(entry['path'])
+            if known and known['sha'] == entry['sha'] and (known.get('local') is None or known['local'] in stored):
+                new_files[entry['path']] = known
+                result.unchanged += 1
+            elif local_library_name(entry['path']) in stored and \
+                    store.get_info(local_library_name(entry['path']))['sha'] == entry['sha']:
+                # Already fetched on demand after a metadata-only sync
+                new_files[entry['path']] = {'sha': entry['sha'], 'local': local_library_name(entry['path'])}
+                result.unchanged += 1
+            else:
+                to_fetch.append(entry)
+        result.total = len(to_fetch)
+
+        # Anything we knew about that is gone upstream gets removed locally
+        upstream_paths = {entry['path'] for entry in entries}
+        for path, info in old_files.items():
+            if path not in upstream_paths and info.get('local'):
+                _remove_library(lib_path, store, info['local'])
+                result.removed.append(info['local'])
+
+        decode_pool = make_decode_pool(len(to_fetch))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, decode_pool:
+            fetches = {executor.submit(_fetch_blob, session, entry, cancel_event): entry for entry in to_fetch}
+            decodes = {}
+            pending = set(fetches)
+            done_count = 0
+            try:
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        if future in fetches:
+                            entry = fetches.pop(future)
+                            try:
+                                blob = future.result()
+                            except SyncCancelled:
+                                result.cancelled = True
+                                continue
+                            except requests.RequestException as e:
+                                # Network trouble: leave it out of the manifest so it is retried
+                                done_count += 1
+                                result.skipped[entry['path']] = str(e)
+                                result.reports.append(FileReport(entry['path'], error=str(e)))
+                                if progress:
+                                    progress(done_count, result.total, entry['path'], str(e))
+                                continue
+                            except (KeyError, ValueError) as e:
+                                # The API answered, but not with a usable blob
+                                report = FileReport(entry['path'], error=f"Unreadable blob: {e}")
+                                _store_decoded(store, result, new_files, report, None, entry['sha'])
+                                done_count += 1
+                                if progress:
+                                    progress(done_count, result.total, entry['path'], report.error)
+                                continue
+                            decode = decode_pool.submit(decode_submission, entry['path'], blob)
+                            decodes[decode] = entry
+                            pending.add(decode)
+                        else:
+                            entry = decodes.pop(future)
+                            report, aliases = future.result()
+                            _store_decoded(store, result, new_files, report, aliases, entry['sha'])
+                            done_count += 1
+                            if progress:
+                                progress(done_count, result.total, entry['path'], report.error)
+            except BaseException:
+                # Ctrl+C in the CLI lands here; don't leave workers fetching.
+                cancel_event.set()
+                executor.shutdown(wait=True, cancel_futures=True)
+                decode_pool.shutdown(wait=True, cancel_futures=True)
+                raise
+    finally:
+        session.close()
+        store.commit()
+        store.close()
+
+    result.cancelled = result.cancelled or cancel_event.is_set()
+    complete = not result.cancelled and len(new_files) == len(entries)
+    new_manifest = {
+        # Only trust the ETag once every blob in this tree is on disk
+        'etag': response.headers.get('ETag') if complete else None,
+        'tree_sha': data.get('sha'),
+        'files': new_files,
+    }
+    if new_manifest != manifest:
+        save_manifest(new_manifest, lib_path)
+    return result
+
+
+def _library_members(tar):
+    """Yields (repo path, member) for library files in a GitHub archive stream.
+
+    GitHub prefixes every member with '<repo>-<branch>/', which is stripped here.
+    """
+    for member in tar:
+        if not member.isfile():
+            continue
+        parts = member.name.split('/', 1)
+        if len(parts) < 2:
+            continue
+        path = parts[1]
+        if path.startswith('library/') and Path(path).suffix in ('.txt', '.json'):
+            yield path, member
+
+
+def sync_library_archive(progress=None, cancel_event=None, source: str = ARCHIVE_URL,
+                         lib_path: Path = LIBRARY_DIR):
+    """Syncs the library store from a single repository tarball instead of the blob API.
+
+    source is either an http(s) URL or a local .tar.gz path. The archive is read
+    as a stream, so only a few library members are held in memory at a time.
+    Files whose blob SHA matches the manifest are not rewritten.
+
+    progress(done, None, path, error) is called per decoded member; the total
+    is unknown until the stream ends. Once MIN_FILES_FOR_PROCESSES changed
+    members have turned up, the rest are decoded on a process pool while the
+    stream keeps being read; a smaller batch stays in this process.
+    """
+    cancel_event = cancel_event or threading.Event()
+    lib_path.mkdir(exist_ok=True)
+    result = SyncResult()
+    manifest = load_manifest(lib_path)
+    old_files = manifest['files']
+    new_files = {}
+    etag = None
+
+    store = LibraryStore(lib_path)
+    stored = store.library_names()
+    store.set_remote_files([], commit=False)  # a full sync supersedes any metadata-only listing
+    _remove_legacy_files(lib_path, manifest, stored)
+    session = None
+    try:
+        if str(source).startswith(('http://', 'https://')):
+            headers = {}
+            if manifest.get('archive_etag') and _manifest_is_complete(manifest, stored):
+                headers['If-None-Match'] = manifest['archive_etag']
+
+            session = make_session(1)
+            response = session.get(source, headers=headers, stream=True, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 304:
+                session.close()
+                store.close()
+                result.not_modified = True
+                result.unchanged = len(old_files)
+                return result
+            response.raise_for_status()
+            response.raw.decode_content = True
+            stream = response.raw
+            etag = response.headers.get('ETag')
+        else:
+            stream = open(source, 'rb')
+    except BaseException:
+        if session:
+            session.close()
+        store.close()
+        raise
+
+    decode_pool = None
+    held = []  # changed members seen before the batch was known to be big enough for processes
+    decodes = {}
+    done = 0
+
+    def start_decoding():
+        nonlocal decode_pool
+        decode_pool = make_decode_pool(len(held))
+        for path, sha, data in held:
+            decodes[decode_pool.submit(decode_submission, path, data)] = (path, sha)
+        held.clear()
+
+    def collect(block: bool):
+        nonlocal done
+        if not decodes:
+            return
+        finished, _ = wait(decodes, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in finished:
+            path, sha = decodes.pop(future)
+            report, aliases = future.result()
+            _store_decoded(store, result, new_files, report, aliases, sha)
+            done += 1
+            if progress:
+                progress(done, None, path, report.error)
+
+    try:
+        with tarfile.open(fileobj=stream, mode='r|*') as tar:
+            for path, member in _library_members(tar):
+                if cancel_event.is_set():
+                    result.cancelled = True
+                    break
+
+                data = tar.extractfile(member).read()
+                sha = git_blob_sha(data)
+                known = old_files.get(path)
+                if known and known['sha'] == sha and (known.get('local') is None or known['local'] in stored):
+                    new_files[path] = known
+                    result.unchanged += 1
+                    continue
+
+                if decode_pool is None:
+                    held.append((path, sha, data))
+                    if len(held) >= MIN_FILES_FOR_PROCESSES:
+                        start_decoding()
+                    continue
+                decodes[decode_pool.submit(decode_submission, path, data)] = (path, sha)
+                # Keep a bounded number of members in flight
+                collect(block=len(decodes) >= 2 * DECODE_WORKERS)
+            if held:
+                start_decoding()
+            while decodes:
+                collect(block=True)
+        result.total = len(result.updated) + len(result.skipped)
+
+        if not result.cancelled:
+            for path, info in old_files.items():
+                if path not in new_files and info.get('local'):
+                    _remove_library(lib_path, store, info['local'])
+                    result.removed.append(info['local'])
+    finally:
+        if decode_pool is not None:
+            decode_pool.shutdown(wait=True)
+        stream.close()
+        if session:
+            session.close()
+        store.commit()
+        store.close()
+
+    if result.cancelled:
+        # Keep what we didn't get to so the next sync can still compare against it
+        new_files = {**old_files, **new_files}
+
+    new_manifest = {
+        'etag': None,
+        'archive_etag': etag if not result.cancelled else None,
+        'tree_sha': None,
+        'files': new_files,
+    }
+    if new_manifest != manifest:
+        save_manifest(new_manifest, lib_path)
+    return result
+
+
+# --- METADATA-ONLY SYNC ---
+
+def read_cached_blob(lib_path: Path, sha: str):
+    """A submission's raw bytes from the blob cache, or None if missing or corrupt."""
+    try:
+        data = (lib_path / BLOB_CACHE_DIR / sha).read_bytes()
+    except (FileNotFoundError, OSError):
+        return None
+    return data if git_blob_sha(data) == sha else None
+
+
+def cache_blob(lib_path: Path, sha: str, data: bytes):
+    cache_dir = lib_path / BLOB_CACHE_DIR
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_dir / f"{sha}.tmp"
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, cache_dir / sha)
+
+
+def sync_library_metadata(progress=None, tree_url: str = TREE_URL, lib_path: Path = LIBRARY_DIR):
+    """Records the branch's file listing (name, path, SHA, size) without downloading any content.
+
+    Costs one request however large the library is, and a 304 when nothing
+    changed. Libraries whose content changed or disappeared upstream are dropped
+    from the store; fetch_library brings one back when it is first opened.
+    result.total is the number of libraries listed, result.removed those dropped.
+    """
+    lib_path.mkdir(exist_ok=True)
+    result = SyncResult()
+    manifest = load_manifest(lib_path)
+
+    store = LibraryStore(lib_path)
+    session = make_session(1)
+    try:
+        headers = {}
+        if manifest.get('metadata_etag'):
+            headers['If-None-Match'] = manifest['metadata_etag']
+        with span('sync.fetch') as s:
+            response = session.get(tree_url, headers=headers, timeout=REQUEST_TIMEOUT)
+            s.add_bytes(len(response.content))
+        if response.status_code == 304:
+            result.not_modified = True
+            return result
+        response.raise_for_status()
+
+        remote = {local_library_name(entry['path']): entry for entry in _library_entries(response.json())}
+        store.set_remote_files([(name, entry['path'], entry['sha'], entry.get('size', 0), entry['url'])
+                                for name, entry in remote.items()], commit=False)
+        result.total = len(remote)
+        for name in store.library_names():
+            entry = remote.get(name)
+            if entry is not None and store.get_info(name)['sha'] == entry['sha']:
+                result.unchanged += 1
+                continue
+            _remove_library(lib_path, store, name)
+            result.removed.append(name)
+        if progress:
+            progress(result.total, result.total, tree_url, None)
+    finally:
+        session.close()
+        store.commit()
+        store.close()
+
+    manifest['metadata_etag'] = response.headers.get('ETag')
+    save_manifest(manifest, lib_path)
+    return result
+
+
+def fetch_library(name: str, lib_path: Path = LIBRARY_DIR):
+    """Makes sure one listed library's content is in the store; returns its FileReport.
+
+    Content comes from the blob cache when it is there, and is otherwise
+    downloaded once and cached under its SHA. Raises KeyError if the library
+    is neither stored nor listed, and requests.RequestException on network errors.
+    """
+    with LibraryStore(lib_path) as store:
+        if store.is_downloaded(name):
+            info = store.get_info(name)
+            return FileReport(name, name, valid=True, size=info['size'], alias_count=info['alias_count'])
+        entry = store.remote_file(name)
+        if entry is None:
+            raise KeyError(name)
+
+        data = read_cached_blob(lib_path, entry['sha'])
+        if data is None:
+            session = make_session(1)
+            try:
+                data = _fetch_blob(session, entry, threading.Event())
+            finally:
+                session.close()
+            cache_blob(lib_path, entry['sha'], data)
+
+        report, aliases = decode_submission(entry['path'], data)
+        if report.valid:
+            store.ingest(name, aliases, sha=entry['sha'])
+        return report
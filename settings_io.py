@@ -0,0 +1,505 @@
+from pathlib import Path
+import atexit
+import json
+import os
+import re
+import select
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+from alias_history import HISTORY_NAME, AliasHistory, apply_delta, make_delta
+from timing import span
+
+# --- GAME SETTINGS ACCESS ---
+# Shared by the CLI and GUI so settings.json is only re-parsed when it really changed.
+# settings.json belongs to the game: only the cmd_alias value is ever parsed, and
+# writes splice a new value into the original bytes, leaving the rest untouched.
+
+POLL_INTERVAL = 1.0
+# Edits arriving within this window are written as one
+COALESCE_DELAY = 0.3
+DEFAULT_LABEL = "Edit"
+
+
+def get_settings_path():
+    """Determines the correct path for Godot app data based on OS."""
+    home = Path.home()
+    if sys.platform == "win32":
+        base = home / "AppData" / "Roaming"
+    elif sys.platform == "darwin":
+        base = home / "Library" / "Application Support"
+    else:
+        base = home / ".local" / "share"
+
+    return base / 'godot' / 'app_userdata' / 'Tower Networking Inc' / 'settings.json'
+
+
+def stat_key(path: Path):
+    """(size, mtime, inode) of a file, or None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+# --- CMD_ALIAS SCANNING ---
+# Only the top level of settings.json is walked. Other members are skipped by
+# the json module's C scanner, and the cmd_alias value is the only one kept.
+
+ALIAS_KEY = 'cmd_alias'
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_scan_once = json.JSONDecoder().scan_once
+
+
+class AliasLocation:
+    """Where cmd_alias sits in a settings file, and how the file is laid out around it.
+
+    start/end bound the value; if the key is missing, start == end is the
+    point just after the last member, where a new one can be inserted.
+    """
+    __slots__ = ('start', 'end', 'found', 'indent', 'newline', 'empty')
+
+    def __init__(self, start, end, found, indent, newline, empty):
+        self.start, self.end, self.found = start, end, found
+        self.indent, self.newline, self.empty = indent, newline, empty
+
+    def moved(self, new_length: int):
+        """This location after the value was replaced by new_length characters."""
+        return AliasLocation(self.start, self.start + new_length, True, self.indent, self.newline, False)
+
+
+def _scan_value(text: str, pos: int):
+    """(value, end) of the JSON value starting at pos."""
+    try:
+        return _scan_once(text, pos)
+    except StopIteration as e:
+        raise json.JSONDecodeError("Expecting value", text, e.value) from None
+
+
+def locate_aliases(text: str, start_at: int = None):
+    """(AliasLocation, aliases) for the top-level cmd_alias member. Raises json.JSONDecodeError.
+
+    start_at may give the already known start of the value (see SettingsCache).
+    """
+    ws = _WHITESPACE.match
+    pos = ws(text, 1 if text.startswith('\ufeff') else 0).end()
+    if text[pos:pos + 1] != '{':
+        raise json.JSONDecodeError("Settings are not a JSON object", text, pos)
+    open_pos = pos
+    pos = ws(text, pos + 1).end()
+
+    # Layout of the members, so an inserted or re-dumped value matches the file
+    line_start = text.rfind('\n', open_pos, pos) + 1
+    indent = text[line_start:pos] if line_start else ''
+    newline = '\r\n' if line_start > 1 and text[line_start - 2:line_start] == '\r\n' else '\n'
+    empty = text[pos:pos + 1] == '}'
+
+    if start_at is not None:
+        value, end = _scan_value(text, start_at)
+        return AliasLocation(start_at, end, True, indent, newline, False), value
+
+    last_end = open_pos + 1
+    while not empty:
+        if text[pos:pos + 1] != '"':
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, pos)
+        name, pos = _scan_value(text, pos)
+        pos = ws(text, pos).end()
+        if text[pos:pos + 1] != ':':
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, pos)
+        value_start = ws(text, pos + 1).end()
+        value, value_end = _scan_value(text, value_start)
+        if name == ALIAS_KEY:
+            return AliasLocation(value_start, value_end, True, indent, newline, False), value
+        last_end = value_end
+        pos = ws(text, value_end).end()
+        char = text[pos:pos + 1]
+        if char == '}':
+            break
+        if char != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+        pos = ws(text, pos + 1).end()
+    return AliasLocation(last_end, last_end, False, indent, newline, empty), {}
+
+
+def dump_aliases(aliases: dict, location: AliasLocation):
+    """The cmd_alias value as text, indented like the members around it."""
+    if not location.indent:
+        return json.dumps(aliases)
+    return json.dumps(aliases, indent=location.indent).replace('\n', location.newline + location.indent)
+
+
+def splice_aliases(text: str, location: AliasLocation, aliases: dict):
+    """(new text, new location): text with cmd_alias replaced, everything else character for character."""
+    value = dump_aliases(aliases, location)
+    if location.found:
+        return text[:location.start] + value + text[location.end:], location.moved(len(value))
+    if location.empty:
+        # Nothing else in the object to preserve
+        text = json.dumps({ALIAS_KEY: aliases}, indent=4)
+        return text, locate_aliases(text)[0]
+    separator = ',' + (location.newline + location.indent if location.indent else ' ')
+    member = f'{separator}{json.dumps(ALIAS_KEY)}: '
+    at = location.start + len(member)
+    new_location = AliasLocation(at, at + len(value), True, location.indent, location.newline, False)
+    return text[:location.start] + member + value + text[location.end:], new_location
+
+
+def new_settings(aliases: dict):
+    """A fresh settings file holding only cmd_alias."""
+    return splice_aliases('{}', locate_aliases('{}')[0], aliases)
+
+
+class SettingsCache:
+    """settings.json's cmd_alias, reused until the file's size, mtime or inode change.
+
+    Keeps the file's text so a write can splice into it. When the file
+    changes but everything before cmd_alias is the same (the usual case), the
+    rescan is one memory compare plus the alias value itself.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = path or get_settings_path()
+        self.key = None
+        self.text = None
+        self.location = None
+        self.aliases = None
+        self.served = None  # the aliases get_aliases() last handed out, i.e. what edits are based on
+        self.lock = threading.RLock()
+
+    def _load(self):
+        """Brings the cached bytes and aliases up to date. Raises FileNotFoundError / json.JSONDecodeError."""
+        key = stat_key(self.path)
+        if key is None:
+            self.invalidate()
+            raise FileNotFoundError(self.path)
+        if key == self.key and self.aliases is not None:
+            return
+
+        # newline='' so CRLF files are spliced, and written back, as CRLF
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        old = self.location
+        if old is not None and old.found and text.startswith(self.text[:old.start]):
+            location, aliases = locate_aliases(text, start_at=old.start)
+        else:
+            location, aliases = locate_aliases(text)
+        self.aliases = aliases if isinstance(aliases, dict) else {}
+        self.text, self.location, self.key = text, location, key
+
+    def get_aliases(self):
+        """A fresh copy of cmd_alias that the caller is free to edit."""
+        with self.lock:
+            self._load()
+            self.served = self.aliases
+            return dict(self.aliases)
+
+    def get_raw(self):
+        """(file text, AliasLocation, aliases) as of now; the aliases dict is shared, don't mutate it."""
+        with self.lock:
+            self._load()
+            return self.text, self.location, self.aliases
+
+    def has_changed(self):
+        """True if the file on disk differs from what was last read or written."""
+        return stat_key(self.path) != self.key
+
+    def refresh_if_changed(self):
+        """Re-reads the file if it changed on disk; True if it did."""
+        with self.lock:
+            if not self.has_changed():
+                return False
+            self._load()
+            return True
+
+    def remember(self, text: str, location: AliasLocation, aliases: dict):
+        """Records a file we just wrote ourselves so it doesn't count as a change."""
+        with self.lock:
+            self.text, self.location, self.aliases = text, location, dict(aliases)
+            self.served = self.aliases
+            self.key = stat_key(self.path)
+
+    def invalidate(self):
+        with self.lock:
+            self.key, self.text, self.location, self.aliases = None, None, None, None
+
+
+settings_cache = SettingsCache()
+
+
+# --- WRITING ---
+
+def atomic_write(path: Path, text: str):
+    """Writes text next to path, fsyncs it and renames it over path.
+
+    A crash leaves either the old file or the new one, never a torn write.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_name, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class SettingsWriter:
+    """Background, coalescing writer for cmd_alias.
+
+    submit() returns immediately; bursts of edits within COALESCE_DELAY become
+    one write, and writes whose cmd_alias matches the file are skipped. Each
+    on_done(success, message) callback runs on the writer thread, after the
+    write counts as finished for flush(). Every write that changes cmd_alias is
+    recorded in the alias history under its label.
+
+    If the file changed after the submitted aliases were read (the game saved
+    during the coalesce delay), only the submitter's own changes are applied
+    on top of the new file, so the outside change survives.
+    """
+
+    def __init__(self, cache: SettingsCache = settings_cache, delay: float = COALESCE_DELAY, history: AliasHistory = None):
+        self.cache = cache
+        self.delay = delay
+        self.history = history or AliasHistory(cache.path.parent / HISTORY_NAME)
+        self.cond = threading.Condition()
+        self.pending = None
+        self.base = None  # what the pending aliases were edited from
+        self.label = None
+        self.callbacks = []
+        self.last_submit = 0.0
+        self.busy = False
+        self.flushing = 0
+        self.thread = None
+
+    def submit(self, aliases: dict, on_done=None, label: str = None):
+        with self.cond:
+            if self.pending is None:
+                self.base = self.cache.served
+            self.pending = dict(aliases)
+            self.label = label or self.label
+            if on_done:
+                self.callbacks.append(on_done)
+            self.last_submit = time.monotonic()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="SettingsWriter", daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def flush(self, timeout: float = None):
+        """Blocks until every submitted write has hit the disk. False on timeout."""
+        with self.cond:
+            self.flushing += 1
+            self.cond.notify_all()
+            try:
+                return self.cond.wait_for(lambda: self.pending is None and not self.busy, timeout)
+            finally:
+                self.flushing -= 1
+
+    def discard_callbacks(self):
+        """Forgets the on_done callbacks of queued writes; the writes themselves still happen."""
+        with self.cond:
+            self.callbacks = []
+
+    def write_now(self, aliases: dict, label: str = None):
+        """Synchronous write through the same queue; returns (success, message).
+
+        The caller is blocked anyway, so the write skips the coalesce delay.
+        """
+        result = []
+        done = threading.Event()
+
+        def on_done(*r):
+            result.append(r)
+            done.set()
+        with self.cond:
+            self.flushing += 1
+        try:
+            self.submit(aliases, on_done, label)
+            done.wait()
+        finally:
+            with self.cond:
+                self.flushing -= 1
+        return result[0]
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending is not None)
+                # Let a burst of edits settle, unless someone is waiting on us
+                while not self.flushing:
+                    remaining = self.last_submit + self.delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                aliases, base, callbacks, label = self.pending, self.base, self.callbacks, self.label
+                self.pending, self.base, self.callbacks, self.label = None, None, [], None
+                self.busy = True
+
+            result = self._write(aliases, label or DEFAULT_LABEL, base)
+
+            # Done before the callbacks run: a callback may need the thread
+            # that is waiting in flush() (e.g. a Tk call while the window closes)
+            with self.cond:
+                self.busy = False
+                self.cond.notify_all()
+
+            for callback in callbacks:
+                try:
+                    callback(*result)
+                except Exception as e:
+                    print(f"Warning: settings write callback failed: {e}", file=sys.stderr)
+
+    def _write(self, aliases: dict, label: str, base: dict = None):
+        message = "Success"
+        try:
+            # Hold the cache lock so the watcher never mistakes this write for an outside change
+            with self.cache.lock, span('save_settings_to_disk') as s:
+                try:
+                    text, location, current = self.cache.get_raw()
+                except FileNotFoundError:
+                    current = {}
+                    new_text, new_location = new_settings(aliases)
+                else:
+                    if base is not None and current is not base and current != base:
+                        # Changed on disk since the caller read it: keep that change, apply only the caller's
+                        aliases = apply_delta(dict(current), make_delta(base, aliases))
+                        message = "Success (merged with a change made outside the manager)"
+                    if current == aliases:
+                        return True, "No changes"
+                    new_text, new_location = splice_aliases(text, location, aliases)
+
+                atomic_write(self.cache.path, new_text)
+                self.cache.remember(new_text, new_location, aliases)
+                s.add_bytes(new_location.end - new_location.start)
+        except Exception as e:
+            return False, str(e)
+
+        try:
+            self.history.record(current, aliases, label)
+        except Exception as e:
+            # The aliases are safely written; a history failure must not undo that
+            print(f"Warning: could not record alias history: {e}", file=sys.stderr)
+        return True, message
+
+
+settings_writer = SettingsWriter()
+atexit.register(settings_writer.flush)
+
+
+# --- FILE WATCHING ---
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def _inotify_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    # Only the watcher needs ctypes; keep it off the CLI's startup path
+    import ctypes.util
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class SettingsWatcher(threading.Thread):
+    """Calls on_change() from a background thread when settings.json really changes.
+
+    Uses inotify on Linux and cheap stat polling everywhere else. Changes the
+    cache already knows about (our own writes) are ignored.
+    """
+
+    def __init__(self, on_change, cache: SettingsCache = settings_cache, interval: float = POLL_INTERVAL):
+        super().__init__(daemon=True)
+        self.on_change = on_change
+        self.cache = cache
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        libc = _inotify_libc()
+        if libc is not None and self.cache.path.parent.exists():
+            try:
+                self._watch_inotify(libc)
+                return
+            except OSError:
+                pass
+        self._watch_polling()
+
+    def _check(self):
+        try:
+            changed = self.cache.refresh_if_changed()
+        except (OSError, ValueError):
+            # Missing or half-written; the next event or poll will catch it
+            return
+        if changed:
+            self.on_change()
+
+    def _watch_polling(self):
+        while not self.stop_event.wait(self.interval):
+            self._check()
+
+    def _watch_inotify(self, libc):
+        import ctypes
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        try:
+            mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+            if libc.inotify_add_watch(fd, os.fsencode(self.cache.path.parent), mask) < 0:
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+            target = os.fsencode(self.cache.path.name)
+            while not self.stop_event.is_set():
+                ready, _, _ = select.select([fd], [], [], self.interval)
+                if not ready:
+                    continue
+                try:
+                    buffer = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+
+                offset, relevant = 0, False
+                while offset < len(buffer):
+                    _wd, _mask, _cookie, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+                    offset += INOTIFY_EVENT.size
+                    name = buffer[offset:offset + length].rstrip(b'\0')
+                    offset += length
+                    relevant = relevant or name == target
+                if relevant:
+                    self._check()
+        finally:
+            os.close(fd)
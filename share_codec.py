@@ -0,0 +1,159 @@
+import base64
+import binascii
+import json
+import lzma
+import re
+import zlib
+
+# --- SHARE STRING FORMAT ---
+# TNA<version><method>-<crc32 of compressed bytes, 8 hex>-<urlsafe base64, no padding>
+#
+#   TNA1z-9f3c2a1b-eNqrVkrLz1eyUkpKLFKqBQAe...
+#
+# The payload is key-sorted compact JSON, compressed with zlib ('z', the
+# default), xz ('x') or not at all ('n'). Strings without the header are
+# treated as the legacy format: plain base64 of the JSON alias map.
+
+FORMAT_VERSION = 1
+HEADER_RE = re.compile(r'^TNA(\d+)([a-z])-([0-9a-f]{8})-')
+DECODE_CHUNK = 256 * 1024  # characters of base64 per step; must be a multiple of 4
+XZ_PRESET = 6  # higher presets cost tens of MB and ~50 ms for a few percent smaller strings
+MAX_DECODED_SIZE = 128 * 1024 * 1024  # bytes of JSON a share string may expand to
+
+
+class ShareCodecError(ValueError):
+    pass
+
+
+class DecodeCancelled(Exception):
+    pass
+
+
+def _compress(method: str, data: bytes):
+    if method == 'z':
+        return zlib.compress(data, 9)
+    if method == 'x':
+        return lzma.compress(data, preset=XZ_PRESET)
+    if method == 'n':
+        return data
+    raise ShareCodecError(f"Unknown compression method '{method}'.")
+
+
+def _decompressor(method: str):
+    """An object with .decompress(chunk) for incremental decoding."""
+    if method == 'z':
+        return zlib.decompressobj()
+    if method == 'x':
+        return lzma.LZMADecompressor()
+    if method == 'n':
+        return None
+    raise ShareCodecError(f"Unknown compression method '{method}'.")
+
+
+def canonical_json(aliases: dict):
+    return json.dumps(aliases, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def encode_share_string(aliases: dict, method: str = 'z'):
+    """Packs an alias map into a compact, checksummed share string.
+
+    method='auto' compresses with both zlib and xz and keeps the smaller; it
+    is several times slower than zlib alone for a few percent.
+    """
+    payload = canonical_json(aliases)
+    if method == 'auto':
+        method, compressed = min(((m, _compress(m, payload)) for m in ('z', 'x')), key=lambda c: len(c[1]))
+    else:
+        compressed = _compress(method, payload)
+
+    checksum = zlib.crc32(compressed) & 0xFFFFFFFF
+    body = base64.urlsafe_b64encode(compressed).decode('ascii').rstrip('=')
+    return f"TNA{FORMAT_VERSION}{method}-{checksum:08x}-{body}"
+
+
+def _inflate(decompressor, parts, progress, cancel_event):
+    """Decompresses the checksummed chunks, refusing to produce more than MAX_DECODED_SIZE bytes."""
+    inflated = []
+    remaining = MAX_DECODED_SIZE
+    for i, chunk in enumerate(parts, start=1):
+        if cancel_event is not None and cancel_event.is_set():
+            raise DecodeCancelled()
+        try:
+            # Asking for one byte past the limit tells "exactly full" from "too big"
+            chunk = decompressor.decompress(chunk, remaining + 1)
+        except (zlib.error, lzma.LZMAError, EOFError) as e:
+            raise ShareCodecError(f"Corrupt share string: {e}")
+        if len(chunk) > remaining:
+            raise ShareCodecError(f"Share string expands to more than {MAX_DECODED_SIZE // (1024 * 1024)} MB.")
+        remaining -= len(chunk)
+        inflated.append(chunk)
+        if progress:
+            progress(0.5 + 0.5 * i / len(parts))
+    if not decompressor.eof:
+        raise ShareCodecError("Corrupt share string: compressed data ends early.")
+    return inflated
+
+
+def is_share_string(text: str):
+    return HEADER_RE.match(text.strip()) is not None
+
+
+def decode_share_string(text: str, progress=None, cancel_event=None, chunk_size: int = DECODE_CHUNK):
+    """Decodes either share format back into an alias map.
+
+    The base64 body is decoded and checksummed in chunks, and only once the
+    checksum matches is it decompressed, again in chunks and to at most
+    MAX_DECODED_SIZE bytes. progress(fraction) is reported and cancel_event
+    honoured throughout. Raises ShareCodecError on anything truncated, corrupt,
+    oversized or not an alias map, and DecodeCancelled if cancelled.
+    """
+    text = ''.join(text.split())  # Pastes often pick up line wraps
+    if not text:
+        raise ShareCodecError("Share string is empty.")
+
+    match = HEADER_RE.match(text)
+    if match:
+        version, method, checksum = int(match.group(1)), match.group(2), int(match.group(3), 16)
+        if version > FORMAT_VERSION:
+            raise ShareCodecError(f"Share string uses format v{version}; please update the Alias Manager.")
+        body = text[match.end():]
+        body += '=' * (-len(body) % 4)
+        b64decode = base64.urlsafe_b64decode
+        decompressor = _decompressor(method)
+    else:
+        body = text
+        checksum = None
+        b64decode = lambda chunk: base64.b64decode(chunk, validate=True)
+        decompressor = None
+
+    # Half the progress bar for decoding, half for decompressing (if any)
+    decode_share = 0.5 if decompressor is not None else 1.0
+    parts = []
+    crc = 0
+    for start in range(0, len(body), chunk_size):
+        if cancel_event is not None and cancel_event.is_set():
+            raise DecodeCancelled()
+        try:
+            chunk = b64decode(body[start:start + chunk_size])
+        except (binascii.Error, ValueError):
+            if checksum is None:
+                raise ShareCodecError("Data provided is not valid Base64.")
+            raise ShareCodecError("Share string is not valid base64. Was it cut off?")
+        crc = zlib.crc32(chunk, crc)
+        parts.append(chunk)
+        if progress:
+            progress(decode_share * min(1.0, (start + chunk_size) / len(body)))
+
+    if checksum is not None and crc & 0xFFFFFFFF != checksum:
+        raise ShareCodecError("Checksum mismatch. The share string is truncated or was altered.")
+
+    if decompressor is not None:
+        parts = _inflate(decompressor, parts, progress, cancel_event)
+
+    try:
+        aliases = json.loads(b''.join(parts).decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ShareCodecError("Data provided is not valid JSON.")
+    if not isinstance(aliases, dict):
+        raise ShareCodecError("Share string does not contain an alias map.")
+    return aliases
@@ -0,0 +1,191 @@
+from pathlib import Path
+import atexit
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+# --- OPT-IN TIMING INSTRUMENTATION ---
+# Off by default and close to free while off. Enable with TOWER_ALIAS_PROFILE=1
+# (or a report path) or --profile; TOWER_ALIAS_CPROFILE=<file> or
+# --cprofile=<file> also dumps cProfile stats for the main thread.
+
+PROFILE_ENV = 'TOWER_ALIAS_PROFILE'
+CPROFILE_ENV = 'TOWER_ALIAS_CPROFILE'
+DEFAULT_REPORT = 'timing_report.json'
+
+enabled = False
+report_path = None
+_lock = threading.Lock()
+_spans = {}  # name -> {'times': [...], 'bytes': int}
+_last = None
+_listeners = []
+_profiler = None
+_cprofile_path = None
+
+
+def percentile(sorted_times, fraction: float):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_times:
+        return 0.0
+    index = min(len(sorted_times) - 1, max(0, math.ceil(fraction * len(sorted_times)) - 1))
+    return sorted_times[index]
+
+
+def format_span(name: str, seconds: float, nbytes: int = 0):
+    text = f"{name}: {seconds * 1000:.1f} ms"
+    if nbytes:
+        text += f", {nbytes:,} bytes"
+    return text
+
+
+def record(name: str, seconds: float, nbytes: int = 0):
+    """Adds one finished span; listeners are called on the recording thread."""
+    global _last
+    with _lock:
+        entry = _spans.setdefault(name, {'times': [], 'bytes': 0})
+        entry['times'].append(seconds)
+        entry['bytes'] += nbytes
+        _last = (name, seconds, nbytes)
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(name, seconds, nbytes)
+        except Exception:
+            # Instrumentation must never break the operation it measured
+            pass
+
+
+class _Span:
+    __slots__ = ('name', 'bytes', 'start')
+
+    def __init__(self, name, nbytes):
+        self.name = name
+        self.bytes = nbytes
+
+    def add_bytes(self, nbytes: int):
+        self.bytes += nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start, self.bytes)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def add_bytes(self, nbytes: int):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, nbytes: int = 0):
+    """with span('dump_alias') as s: ...; s.add_bytes(n) -- a no-op unless enabled."""
+    return _Span(name, nbytes) if enabled else _NO_SPAN
+
+
+def timed(name: str):
+    """Decorator form of span()."""
+    def wrap(fn):
+        def inner(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, 0):
+                return fn(*args, **kwargs)
+        inner.__name__, inner.__doc__, inner.__wrapped__ = fn.__name__, fn.__doc__, fn
+        return inner
+    return wrap
+
+
+def add_listener(callback):
+    """callback(name, seconds, bytes) after every span, from whichever thread ran it."""
+    with _lock:
+        _listeners.append(callback)
+
+
+def last_span():
+    """(name, seconds, bytes) of the most recently finished span, or None."""
+    return _last
+
+
+def summary():
+    """{name: {'count', 'total', 'p50', 'p95', 'max', 'bytes'}} with times in seconds."""
+    with _lock:
+        spans = {name: (sorted(entry['times']), entry['bytes']) for name, entry in _spans.items()}
+    return {name: {'count': len(times), 'total': sum(times), 'p50': percentile(times, 0.5),
+                   'p95': percentile(times, 0.95), 'max': times[-1], 'bytes': nbytes}
+            for name, (times, nbytes) in sorted(spans.items())}
+
+
+def format_summary(stats: dict = None):
+    stats = summary() if stats is None else stats
+    lines = [f"{'span':<32} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'total ms':>11} {'bytes':>14}"]
+    for name, s in stats.items():
+        lines.append(f"{name:<32} {s['count']:>6} {s['p50'] * 1000:>10.2f} {s['p95'] * 1000:>10.2f} "
+                     f"{s['total'] * 1000:>11.1f} {s['bytes']:>14,}")
+    return '\n'.join(lines)
+
+
+def write_report(path=None):
+    path = Path(path or report_path or DEFAULT_REPORT)
+    with open(path, 'w') as f:
+        json.dump({'spans': summary()}, f, indent=4)
+    return path
+
+
+def _finish():
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_cprofile_path)
+        print(f"cProfile stats written to {_cprofile_path}", file=sys.stderr)
+    if enabled and _spans:
+        path = write_report()
+        print(f"\n{format_summary()}\nTiming report written to {path}", file=sys.stderr)
+
+
+def enable(report: str = None, cprofile: str = None):
+    """Turns spans on; the report (and cProfile dump) are written at exit."""
+    global enabled, report_path, _profiler, _cprofile_path
+    first = not enabled and _profiler is None
+    enabled = True
+    report_path = report or report_path
+    if cprofile and _profiler is None:
+        import cProfile
+        _cprofile_path = cprofile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    if first:
+        atexit.register(_finish)
+
+
+def configure(argv: list = None):
+    """Enables instrumentation from the environment and strips --profile/--cprofile from argv."""
+    report = os.environ.get(PROFILE_ENV, '')
+    cprofile = os.environ.get(CPROFILE_ENV) or None
+    wanted = report not in ('', '0')
+
+    if argv is not None:
+        for arg in list(argv[1:]):
+            if arg == '--profile' or arg.startswith('--profile='):
+                wanted = True
+                report = arg.partition('=')[2] or report
+                argv.remove(arg)
+            elif arg.startswith('--cprofile='):
+                cprofile = arg.partition('=')[2]
+                argv.remove(arg)
+
+    if wanted or cprofile:
+        enable(report if report not in ('', '0', '1') else None, cprofile)
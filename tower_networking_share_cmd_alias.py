@@ -1,39 +1,97 @@
-from binascii import Error
-from pathlib import Path
-import base64
+import argparse
 import json
+import os
 import re
-import requests
 import sys
 
+from settings_io import settings_cache, settings_writer
+from share_codec import ShareCodecError, decode_share_string, encode_share_string
+import timing
 
-def dump_alias(plain_text:bool =False):
-    appdata_path = get_settings_path()
+# The library, sync and merge modules (and requests) are imported inside the
+# functions that need them, so local subcommands start quickly. When an alias
+# daemon is running, reads and writes go through it instead of settings.json.
+
+CLI_PAGE_SIZE = 50
+CLI_DIFF_LIMIT = 100
+
+# Exit codes for the subcommands
+EXIT_OK = 0
+EXIT_ERROR = 1           # bad input, failed write or failed sync
+EXIT_USAGE = 2           # argparse's own code for bad arguments
+EXIT_DECLINED = 3        # confirmation refused, or needed but --yes not given
+EXIT_NO_SETTINGS = 4     # settings.json not found
+EXIT_INTERRUPTED = 130
+
+# Same names as alias_diff's policies, listed here so parsing arguments doesn't import it
+POLICY_CHOICES = ('replace', 'take_theirs', 'keep_mine', 'rename')
+DEFAULT_POLICY = 'take_theirs'  # alias_diff.DEFAULT_POLICY, shared with the GUI
+
+
+_daemon = False  # not looked for yet
+
+def alias_daemon():
+    """Client for the running alias daemon, or None to use settings.json directly."""
+    global _daemon
+    if _daemon is False:
+        from alias_daemon import connect_daemon
+        _daemon = connect_daemon()
+    return _daemon
+
+def lost_daemon():
+    """Stops using a daemon that went away mid-request; settings.json is used from here on."""
+    global _daemon
+    _daemon = None
+
+def read_aliases():
+    """The current aliases; raises FileNotFoundError if there is no settings.json."""
+    from alias_daemon import DaemonError
+
+    daemon = alias_daemon()
+    if daemon is not None:
+        try:
+            return daemon.get_aliases()[0]
+        except FileNotFoundError:
+            raise
+        except (OSError, ValueError, DaemonError):
+            lost_daemon()
+    return settings_cache.get_aliases()
+
+def write_aliases(aliases: dict, label: str):
+    """Saves aliases; returns (success, message).
 
+    Through the daemon only the keys that differ from the last read are sent,
+    and the write is refused if another client changed anything in between.
+    """
+    from alias_daemon import DaemonError
+
+    daemon = alias_daemon()
+    if daemon is not None:
+        try:
+            return daemon.write(aliases, label, check=True)
+        except FileNotFoundError:
+            raise
+        except (OSError, ValueError, DaemonError):
+            lost_daemon()
+    return settings_writer.write_now(aliases, label)
+
+@timing.timed('dump_alias')
+def dump_alias(plain_text:bool =False):
     try:
-        with open(appdata_path, 'r') as f:
-            data = json.load(f)
+        aliases = read_aliases()
     except FileNotFoundError:
         return "Error: Settings file not found. Have you run the game yet?"
 
     if plain_text:
-        return json.dumps(data.get('cmd_alias', {}), indent=2)
-    else:
-        aliases = data.get('cmd_alias', {})
-        return base64.b64encode(json.dumps(aliases).encode('utf-8')).decode('utf-8')
-
-def get_settings_path():
-    home = Path.home()
-    if sys.platform == "win32":
-        base = home / "AppData" / "Roaming"
-    elif sys.platform == "darwin":
-        base = home / "Library" / "Application Support"
-    elif sys.platform == "linux":
-        base = home / ".local" / "share"
+        return json.dumps(aliases, indent=2)
     else:
-        raise OSError(f"Unsupported platform: {sys.platform}")
+        return encode_share_string(aliases)
 
-    return base / 'godot' / 'app_userdata' / 'Tower Networking Inc' / 'settings.json'
+def get_current_aliases():
+    try:
+        return read_aliases()
+    except FileNotFoundError:
+        return {}
 
 def get_user_input():
     try:
@@ -43,136 +101,612 @@ def get_user_input():
     return user_input
 
 def load_base64_string():
-    user_input = input('Paste the Base64 encoded string here: ')
+    user_input = input('Paste the share string (or legacy Base64) here: ')
     try:
-        decoded_json = base64.b64decode(user_input.encode('utf-8')).decode('utf-8')
-        new_aliases = json.loads(decoded_json)
-    except (Error, json.JSONDecodeError):
-        print('Error: Data provided is not valid Base64 or JSON.')
+        with timing.span('decode_share_string', len(user_input)):
+            new_aliases = decode_share_string(user_input)
+    except ShareCodecError as e:
+        print(f'Error: {e}')
         return
 
-    print("Preview of aliases to import:")
-    print(json.dumps(new_aliases, indent=2))
+    write_to_file(new_aliases, "Import share string")
 
-    write_to_file(new_aliases)
+def download_library(name: str):
+    """Fetches the content of a library a metadata-only sync listed; True once it is stored."""
+    from library_sync import fetch_library
 
-def load_library():
-    file_list = []
-    
-    if not Path('library').exists():
-        Path('library').mkdir()
-
-    for root, dirs, files in Path('library').walk():
-        for file in files:
-            if file.endswith('.json'):
-                file_list.append(file)
-                
-    if not file_list:
-        print("No library files found. Try running [5] Pull libraries first.")
-        return
+    try:
+        with timing.span('fetch_library'):
+            report = fetch_library(name)
+    except KeyError:
+        err(f"Error: No library named '{name}'.")
+        return False
+    except Exception as e:
+        err(f"Error downloading {name}: {e}")
+        return False
+    if not report.valid:
+        err(f"Skipping {name}: {report.error}")
+        return False
+    return True
 
-    while True:
-        for i, file in enumerate(file_list, start=1):
-            print(f"[{i}] {file}")
-        print('[Q] Go Back')
-        user_input = get_user_input()
+def describe_count(alias_count):
+    return "not downloaded" if alias_count is None else f"{alias_count} aliases"
 
-        if user_input.lower() in ['', 'q']:
-            break
-            
-        try:
-            selection_index = int(user_input) - 1
-            if 0 <= selection_index < len(file_list):
-                filename = Path('library') / file_list[selection_index]
-                
-                # Just load the JSON directly
-                data = json.load(open(filename, 'r'))
-
-                print("\nPreview of aliases to import:")
-                print(json.dumps(data['plaintext'], indent=4))
-
-                if write_to_file(data['plaintext']):
-                    break
-            else:
-                print("Invalid number.")
-        except ValueError:
-            print("Please enter a number.")
+def load_library():
+    from library_preview import PreviewCache, format_summary
+    from library_similarity import collapse
+    from library_store import LibraryStore
+
+    with LibraryStore() as store:
+        previews = PreviewCache(store)
+        libraries = store.libraries_matching('')
+        if not libraries:
+            print("No library files found. Try running [5] Pull libraries first.")
+            return
+        clusters = store.duplicate_clusters()
+        collapsed = bool(clusters)
+
+        while True:
+            shown, hidden = libraries, {}
+            if collapsed:
+                kept, hidden = collapse([name for name, _count, _hits in libraries],
+                                        {name: count for name, count, _hits in libraries}, clusters)
+                kept = set(kept)
+                shown = [entry for entry in libraries if entry[0] in kept]
+            for i, (name, alias_count, hits) in enumerate(shown, start=1):
+                suffix = f", {hits} matches" if hits else ""
+                if hidden.get(name):
+                    suffix += f", +{len(hidden[name])} near-duplicates"
+                print(f"[{i}] {name} ({describe_count(alias_count)}{suffix})")
+            print('[S] Search all libraries')
+            if clusters:
+                print('[D] Show near-duplicates' if collapsed else '[D] Collapse near-duplicates')
+            print('[Q] Go Back')
+            user_input = get_user_input()
+
+            if user_input.lower() in ['', 'q']:
+                break
+
+            if user_input.lower() == 'd' and clusters:
+                collapsed = not collapsed
+                continue
+
+            if user_input.lower() == 's':
+                query = input('Search for alias name or command: ').strip()
+                results = store.search(query)
+                for library, alias, command in results[:CLI_PAGE_SIZE]:
+                    print(f"  {library}: {alias} = {command}")
+                if len(results) > CLI_PAGE_SIZE:
+                    print(f"  ...and {len(results) - CLI_PAGE_SIZE} more")
+                libraries = store.libraries_matching(query)
+                if not libraries:
+                    print("No libraries matched.")
+                    libraries = store.libraries_matching('')
+                continue
+
+            try:
+                selection_index = int(user_input) - 1
+                if 0 <= selection_index < len(shown):
+                    name, alias_count, _hits = shown[selection_index]
+                    if alias_count is None:
+                        print(f"Downloading {name}...")
+                        if not download_library(name):
+                            continue
+                        # The index was built without it; rebuild on next use
+                        store.similarity = None
+                        libraries = [(entry[0], store.get_info(name)['alias_count'], entry[2]) if entry[0] == name
+                                     else entry for entry in libraries]
+                    print(f"\n{name}: {format_summary(store.get_info(name))}")
+                    preview = previews.get(name)
+
+                    if preview_library(preview) and write_to_file(preview.aliases, f"Import {name}"):
+                        break
+                else:
+                    print("Invalid number.")
+            except ValueError:
+                print("Please enter a number.")
+
+def preview_library(preview):
+    """Pages through a library; True if the user wants to import it."""
+    print("Preview of aliases to import:")
+    shown = 0
+    while True:
+        print(preview.render_page(shown, CLI_PAGE_SIZE).rstrip('\n'))
+        shown += CLI_PAGE_SIZE
+        more = shown < len(preview)
+        if more:
+            print(f"-- {shown} of {len(preview)} aliases shown --")
+        answer = input('[M] More  [I] Import  [Q] Back: ' if more else '[I] Import  [Q] Back: ').lower()
+        if answer in ['i', 'import']:
+            return True
+        if not (more and answer in ['', 'm', 'more']):
+            return False
 
 def pull_new_files():
-    if not Path('library').exists():
-        Path('library').mkdir()
-
-    session = requests.Session()
-    print("Checking for updates from GitHub...")
-    try:
-        url = "https://api.github.com/repos/iiEpic/tower-networking-alias-manager/git/trees/46741b60579bf645139403109d3d1a6ee2a8ef76?recursive=1"
-        response = session.get(url)
-        data = response.json()
-
-        for file in [i for i in data.get("tree", []) if i['path'].startswith('library/')]:
-            file_response = session.get(file['url'])
-            blob_data = file_response.json()
-
-            raw_file_content = base64.b64decode(blob_data['content']).decode('utf-8')
-            
-            final_json = {}
-            local_filename = Path('library') / file['path'].replace('library/', '')
-
-            if local_filename.suffix == '.txt':
-                try:
-                    final_json = json.loads(base64.b64decode(raw_file_content).decode('utf-8'))
-                    local_filename = local_filename.with_suffix('.json')
-                except Exception as e:
-                    print(f"Skipping {local_filename}: Invalid Base64 string.")
-                    continue
-
-            elif local_filename.suffix == '.json':
-                try:
-                    final_json = json.loads(raw_file_content)
-                except json.JSONDecodeError:
-                    continue
-
-            with open(local_filename, 'w+') as f:
-                json.dump(final_json, f, indent=4)
-                
-        print('Successfully updated library files.')
-        
+    from library_store import LibraryStore
+    from library_sync import SYNC_MODE, sync_library
+
+    print("Checking for updates from GitHub... (Ctrl+C to cancel)")
+
+    def report(done, total, path, error):
+        if error:
+            print(f"\nSkipping {path}: {error}")
+        print(f"\r[{done}/{total or '?'}] {path}".ljust(60), end='', flush=True)
+
+    try:
+        with timing.span('sync_library'):
+            result = sync_library(progress=report)
+    except KeyboardInterrupt:
+        print('\nSync cancelled.')
+        return
     except Exception as e:
         print(f'Error updating library: {e}')
+        return
 
-def write_to_file(new_aliases: dict):
-    confirm = input('Overwriting your current aliases with these. Are you sure? [Y/n]: ')
-    if confirm.lower() in ['', 'y', 'ye', 'yes']:
-        appdata_path = get_settings_path()
+    if result.not_modified:
+        print('Library is already up to date.')
+        return
+    if SYNC_MODE == 'metadata':
+        print(f'\nListed {result.total} libraries ({len(result.removed)} stale copies removed). '
+              'Each one downloads when you open it.')
+        return
 
-        try:
-            with open(appdata_path, 'r') as f:
-                full_settings = json.load(f)
-        except FileNotFoundError:
-            print("Error: Could not find settings file.")
+    print(f'\nSuccessfully updated {len(result.updated)} library files ({result.unchanged} unchanged, {len(result.removed)} removed).')
+    with LibraryStore() as store:
+        stats = store.stats()
+    print(f"{stats['aliases']} aliases in {stats['libraries']} libraries, {stats['unique_bodies']} unique commands stored.")
+
+def parse_selection(text: str, count: int):
+    """'1,3-5' -> {0, 2, 3, 4}; raises ValueError on anything out of range."""
+    picked = set()
+    for part in text.replace(' ', '').split(','):
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        for n in range(int(first), int(last or first) + 1):
+            if not 1 <= n <= count:
+                raise ValueError(n)
+            picked.add(n - 1)
+    return picked
+
+def write_to_file(new_aliases: dict, label: str = "Import", policy: str = None):
+    """Asks how to merge new_aliases unless policy is given (restore and undo replace everything)."""
+    from alias_diff import DEFAULT_POLICY, KEEP_MINE, RENAME, REPLACE_ALL, TAKE_THEIRS, diff_aliases, merge_aliases
+
+    if alias_daemon() is None and not settings_cache.path.exists():
+        print("Error: Could not find settings file.")
+        return
+
+    diff = diff_aliases(get_current_aliases(), new_aliases)
+    print(f"\nChanges: {diff.summary()}")
+    if not diff.differences:
+        print("Nothing to import. Your aliases already match.")
+        return True
+    print(diff.render(limit=CLI_DIFF_LIMIT))
+
+    selected = None
+    if policy is not None:
+        if input(f'{label}? [y/N]: ').strip().lower() not in ('y', 'yes'):
+            print("Cancelled.")
+            return False
+    else:
+        print('[T] Take theirs  [K] Keep mine  [N] Rename on conflict  [R] Replace all  [S] Select keys  [C] Cancel')
+        policies = {'t': TAKE_THEIRS, 'k': KEEP_MINE, 'n': RENAME, 'r': REPLACE_ALL}
+        default = next(letter for letter, option in policies.items() if option == DEFAULT_POLICY)
+        choice = input(f'How should these be imported? [{default.upper()}]: ').lower() or default
+
+        if choice == 's':
+            differences = diff.differences
+            for i, (status, key) in enumerate(differences, start=1):
+                print(f"[{i}] {status}: {key}")
+            try:
+                selected = [differences[i][1] for i in parse_selection(input('Keys to import (e.g. 1,3-5): '), len(differences))]
+            except ValueError:
+                print("Invalid selection. Cancelled.")
+                return False
+            policy = TAKE_THEIRS
+        elif choice in policies:
+            policy = policies[choice]
+        else:
+            print("Cancelled.")
+            return False
+
+    merged = merge_aliases(diff, policy, selected)
+    if merged == diff.current:
+        print("Nothing to change. Your aliases were left untouched.")
+        return True
+
+    success, msg = write_aliases(merged, label)
+    if not success:
+        print(f"Error: Could not write settings file: {msg}")
+        return
+
+    print('Success! Aliases updated.')
+    return True
+
+def show_history():
+    from alias_diff import REPLACE_ALL
+    from alias_history import format_snapshot
+
+    entries = settings_writer.history.list_snapshots(CLI_PAGE_SIZE)
+    if not entries:
+        print("No history yet. Snapshots are recorded every time your aliases are saved.")
+        return
+    for entry in entries:
+        print(format_snapshot(entry))
+
+    choice = input('Snapshot to restore (e.g. 12), U to undo the last change, or Enter to go back: ').strip().lstrip('#')
+    if not choice:
+        return
+    if choice.lower() == 'u':
+        target = settings_writer.history.undo_target()
+        if target is None:
+            print("Nothing to undo.")
             return
+        undone, snapshot_id = target
+        write_to_file(settings_writer.history.restore(snapshot_id), f"Undo #{undone}", REPLACE_ALL)
+        return
+    try:
+        snapshot_id = int(choice)
+        restored = settings_writer.history.restore(snapshot_id)
+    except (ValueError, KeyError):
+        print("No such snapshot.")
+        return
+    write_to_file(restored, f"Restore #{snapshot_id}", REPLACE_ALL)
+
+def find_and_replace():
+    from bulk_edit import BulkEditError, bulk_replace, compile_pattern
+
+    pattern_text = input('Find: ')
+    regex = input('Is that a regular expression? [y/N]: ').strip().lower() in ('y', 'yes')
+    try:
+        pattern = compile_pattern(pattern_text, regex)
+        current = get_current_aliases()
+        changes, matches = bulk_replace(current, pattern, input('Replace with: '), regex)
+    except BulkEditError as e:
+        print(f"Error: {e}")
+        return
+    if not changes:
+        print("No aliases matched.")
+        return
+    print(f"{matches} matches in {len(changes)} aliases.")
+    write_to_file({**current, **changes}, f"Replace {pattern_text!r} in {len(changes)} aliases")
 
-        full_settings['cmd_alias'] = new_aliases
+# --- SUBCOMMANDS ---
 
-        with open(appdata_path, 'w') as f:
-            json.dump(full_settings, f, indent=4)
+def err(message: str):
+    print(message, file=sys.stderr)
 
-        print('Success! Aliases updated.')
+def confirm(question: str, assume_yes: bool, reading_stdin: bool = False):
+    """True if --yes was given or the user agrees at a terminal."""
+    if assume_yes:
         return True
-    else:
-        print("Cancelled.")
+    if reading_stdin or not sys.stdin.isatty():
+        err("Refusing to change aliases without confirmation; pass --yes.")
         return False
+    return input(f"{question} [y/N]: ").strip().lower() in ('y', 'yes')
 
-def main():
-    # library = pull_new_files()
+def apply_aliases(new_aliases: dict, policy: str, assume_yes: bool, label: str, reading_stdin: bool = False):
+    """Merges new_aliases into settings.json and returns an exit code."""
+    from alias_diff import diff_aliases, merge_aliases
 
+    try:
+        current = read_aliases()
+    except FileNotFoundError:
+        err("Error: Settings file not found. Have you run the game yet?")
+        return EXIT_NO_SETTINGS
+
+    diff = diff_aliases(current, new_aliases)
+    merged = merge_aliases(diff, policy)
+    err(f"Changes: {diff.summary()}")
+    if merged == current:
+        err("Nothing to change.")
+        return EXIT_OK
+    if not assume_yes:
+        err(diff.render(limit=CLI_DIFF_LIMIT))
+    if not confirm(f"Apply with policy '{policy}'?", assume_yes, reading_stdin):
+        return EXIT_DECLINED
+
+    success, msg = write_aliases(merged, label)
+    if not success:
+        err(f"Error: Could not write settings file: {msg}")
+        return EXIT_ERROR
+    err(f"Aliases updated ({len(merged)} total).")
+    return EXIT_OK
+
+def cmd_dump(args):
+    try:
+        with timing.span('dump_alias'):
+            aliases = read_aliases()
+            if args.plain:
+                json.dump(aliases, sys.stdout, indent=2)
+            else:
+                sys.stdout.write(encode_share_string(aliases))
+            sys.stdout.write('\n')
+    except FileNotFoundError:
+        err("Error: Settings file not found. Have you run the game yet?")
+        return EXIT_NO_SETTINGS
+    except json.JSONDecodeError as e:
+        err(f"Error: settings.json is not valid JSON: {e}")
+        return EXIT_ERROR
+    return EXIT_OK
+
+def cmd_import(args):
+    reading_stdin = args.file == '-'
+    try:
+        if reading_stdin:
+            text = sys.stdin.read()
+        else:
+            with open(args.file, 'r') as f:
+                text = f.read()
+    except OSError as e:
+        err(f"Error: {e}")
+        return EXIT_ERROR
+
+    try:
+        with timing.span('decode_share_string', len(text)):
+            new_aliases = decode_share_string(text)
+    except ShareCodecError as e:
+        err(f"Error: {e}")
+        return EXIT_ERROR
+    source = "stdin" if reading_stdin else args.file
+    return apply_aliases(new_aliases, args.policy, args.yes, f"Import {source}", reading_stdin)
+
+def cmd_sync(args):
+    from library_sync import SYNC_MODE, sync_library
+
+    def report(done, total, path, error):
+        if error:
+            err(f"Skipping {path}: {error}")
+        elif args.verbose:
+            err(f"[{done}/{total or '?'}] {path}")
+
+    try:
+        with timing.span('sync_library'):
+            result = sync_library(progress=report, mode=args.mode)
+    except KeyboardInterrupt:
+        err("Sync cancelled.")
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        err(f"Error updating library: {e}")
+        return EXIT_ERROR
+
+    if args.report:
+        from dataclasses import asdict
+        with open(args.report, 'w') as f:
+            json.dump([asdict(report) for report in result.reports], f, indent=4)
+
+    if result.not_modified:
+        print("Library is already up to date.")
+    elif (args.mode or SYNC_MODE) == 'metadata':
+        print(f"Listed {result.total} libraries ({len(result.removed)} stale copies removed); "
+              "each downloads when first applied.")
+    else:
+        print(f"Updated {len(result.updated)} library files ({result.unchanged} unchanged, "
+              f"{len(result.removed)} removed, {len(result.skipped)} skipped).")
+    return EXIT_OK
+
+def cmd_list(args):
+    from library_store import LibraryStore
+
+    with LibraryStore() as store:
+        libraries = store.libraries_matching(args.query)
+        if args.collapse:
+            from library_similarity import collapse
+            kept, _hidden = collapse([name for name, _count, _hits in libraries],
+                                     {name: count for name, count, _hits in libraries}, store.duplicate_clusters())
+            kept = set(kept)
+            libraries = [entry for entry in libraries if entry[0] in kept]
+    for name, alias_count, hits in libraries:
+        print(f"{name}\t{'-' if alias_count is None else alias_count}" + (f"\t{hits}" if args.query.strip() else ""))
+    return EXIT_OK
+
+def cmd_similar(args):
+    from library_store import LibraryStore
+
+    with LibraryStore() as store:
+        if args.library is None:
+            for group in store.duplicate_clusters(args.threshold):
+                print('\t'.join(group))
+            return EXIT_OK
+        name = args.library
+        if name not in store.library_names() and f"{name}.json" in store.library_names():
+            name = f"{name}.json"
+        try:
+            similar = store.similar_libraries(name, args.threshold)
+        except KeyError:
+            err(f"Error: No library named '{args.library}'. Run 'list' to see what is available.")
+            return EXIT_ERROR
+    for name, score in similar:
+        print(f"{name}\t{score:.2f}")
+    return EXIT_OK
+
+def cmd_apply(args):
+    from library_store import LibraryStore
+
+    with LibraryStore() as store:
+        name = args.library
+        if not store.is_downloaded(name) and store.remote_file(name) is None:
+            name = f"{name}.json"
+        if not store.is_downloaded(name) and store.remote_file(name) is not None:
+            err(f"Downloading {name}...")
+            if not download_library(name):
+                return EXIT_ERROR
+        try:
+            new_aliases = store.get_aliases(name)
+        except KeyError:
+            err(f"Error: No library named '{args.library}'. Run 'sync' first, or 'list' to see what is available.")
+            return EXIT_ERROR
+    return apply_aliases(new_aliases, args.policy, args.yes, f"Import {name}")
+
+def cmd_history(args):
+    from alias_history import format_snapshot
+
+    for entry in settings_writer.history.list_snapshots(args.limit):
+        print(format_snapshot(entry))
+    return EXIT_OK
+
+def cmd_restore(args):
+    try:
+        restored = settings_writer.history.restore(args.snapshot)
+    except KeyError:
+        err(f"Error: No snapshot #{args.snapshot}. Run 'history' to list them.")
+        return EXIT_ERROR
+    return apply_aliases(restored, 'replace', args.yes, f"Restore #{args.snapshot}")
+
+def cmd_undo(args):
+    target = settings_writer.history.undo_target()
+    if target is None:
+        err("Error: Nothing to undo. Run 'history' to see what was saved.")
+        return EXIT_ERROR
+    undone, snapshot_id = target
+    err(f"Undoing #{undone} (back to #{snapshot_id}).")
+    return apply_aliases(settings_writer.history.restore(snapshot_id), 'replace', args.yes, f"Undo #{undone}")
+
+def cmd_replace(args):
+    from bulk_edit import BulkEditError, bulk_replace, compile_pattern
+
+    regex = not args.literal
+    try:
+        pattern = compile_pattern(args.pattern, regex, args.ignore_case)
+        current = read_aliases()
+        with timing.span('bulk_replace'):
+            changes, matches = bulk_replace(current, pattern, args.replacement, regex)
+    except BulkEditError as e:
+        err(f"Error: {e}")
+        return EXIT_ERROR
+    except FileNotFoundError:
+        err("Error: Settings file not found. Have you run the game yet?")
+        return EXIT_NO_SETTINGS
+
+    err(f"{matches} matches in {len(changes)} aliases.")
+    if not changes:
+        return EXIT_OK
+    return apply_aliases({**current, **changes}, 'replace', args.yes,
+                         f"Replace {args.pattern!r} in {len(changes)} aliases")
+
+def cmd_daemon(args):
+    from alias_daemon import DaemonError, connect_daemon, run_daemon
+
+    if args.stop or args.status:
+        client = connect_daemon()
+        if client is None:
+            err("No alias daemon is running.")
+            return EXIT_ERROR
+        if args.stop:
+            client.request('shutdown')
+            err("Alias daemon stopped.")
+        else:
+            info, version = client.request('ping')
+            print(f"Alias daemon {info['pid']} on {client.path}: {info['aliases']} aliases, version {version}")
+        return EXIT_OK
+
+    try:
+        run_daemon()
+    except DaemonError as e:
+        err(f"Error: {e}")
+        return EXIT_ERROR
+    return EXIT_OK
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="tower_networking_share_cmd_alias.py",
+        description="Manage Tower Networking Inc command aliases. Run without a command for the interactive menu.",
+        epilog="--profile[=FILE] and --cprofile=FILE enable timing instrumentation.")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+
+    dump = commands.add_parser('dump', help="print the current aliases as a share string")
+    dump.add_argument('--plain', action='store_true', help="print plain JSON instead")
+    dump.set_defaults(func=cmd_dump)
+
+    def add_merge_options(sub):
+        sub.add_argument('--policy', choices=POLICY_CHOICES, default=DEFAULT_POLICY,
+                         help="how to merge with the current aliases (default: %(default)s)")
+        sub.add_argument('-y', '--yes', action='store_true', help="apply without asking")
+
+    imp = commands.add_parser('import', help="import a share string from a file or stdin")
+    imp.add_argument('file', nargs='?', default='-', help="file holding the share string, or - for stdin (default)")
+    add_merge_options(imp)
+    imp.set_defaults(func=cmd_import)
+
+    sync = commands.add_parser('sync', help="pull the alias library from GitHub")
+    sync.add_argument('--mode', choices=('api', 'archive', 'metadata'),
+                      help="sync through the blob API or one tarball, or only list libraries and download each on first use")
+    sync.add_argument('-v', '--verbose', action='store_true', help="report every file on stderr")
+    sync.add_argument('--report', metavar='FILE', help="write a JSON report (valid, size, alias count, error) per fetched file")
+    sync.set_defaults(func=cmd_sync)
+
+    lst = commands.add_parser('list', help="list synced libraries (name, alias count[, matches])")
+    lst.add_argument('query', nargs='?', default='', help="only libraries whose name or aliases match")
+    lst.add_argument('--collapse', action='store_true', help="show one library per group of near-duplicates")
+    lst.set_defaults(func=cmd_list)
+
+    similar = commands.add_parser('similar', help="near-duplicate libraries of one library, or every group of them")
+    similar.add_argument('library', nargs='?', help="library name as shown by 'list' (default: list every group)")
+    similar.add_argument('--threshold', type=float, help="estimated similarity from 0 to 1 (default: 0.7)")
+    similar.set_defaults(func=cmd_similar)
+
+    apply = commands.add_parser('apply', help="import a synced library")
+    apply.add_argument('library', help="library name as shown by 'list'")
+    add_merge_options(apply)
+    apply.set_defaults(func=cmd_apply)
+
+    replace = commands.add_parser('replace', help="regex find & replace across every alias body, saved as one write")
+    replace.add_argument('pattern', help="regular expression (or text with --literal)")
+    replace.add_argument('replacement', help=r"replacement; may use \1 or \g<name> unless --literal")
+    replace.add_argument('--literal', action='store_true', help="treat pattern and replacement as plain text")
+    replace.add_argument('-i', '--ignore-case', action='store_true')
+    replace.add_argument('-y', '--yes', action='store_true', help="apply without asking")
+    replace.set_defaults(func=cmd_replace)
+
+    history = commands.add_parser('history', help="list alias snapshots, newest first")
+    history.add_argument('-n', '--limit', type=int, default=CLI_PAGE_SIZE, help="how many to show (default: %(default)s)")
+    history.set_defaults(func=cmd_history)
+
+    restore = commands.add_parser('restore', help="roll the aliases back to a snapshot")
+    restore.add_argument('snapshot', type=lambda text: int(text.lstrip('#')), help="snapshot number from 'history'")
+    restore.add_argument('-y', '--yes', action='store_true', help="restore without asking")
+    restore.set_defaults(func=cmd_restore)
+
+    undo = commands.add_parser('undo', help="undo the last change to the aliases; repeat to go further back")
+    undo.add_argument('-y', '--yes', action='store_true', help="undo without asking")
+    undo.set_defaults(func=cmd_undo)
+
+    daemon = commands.add_parser('daemon', help="serve the aliases to other clients over a local socket")
+    daemon.add_argument('--stop', action='store_true', help="stop the running daemon")
+    daemon.add_argument('--status', action='store_true', help="show whether a daemon is running")
+    daemon.set_defaults(func=cmd_daemon)
+
+    return parser
+
+def main(argv=None):
+    argv = list(sys.argv if argv is None else argv)
+    timing.configure(argv)
+    args = build_parser().parse_args(argv[1:])
+    if args.command is None:
+        interactive_menu()
+        return EXIT_OK
+
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    except BrokenPipeError:
+        # Output piped into something like head; not an error for us
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return EXIT_OK
+
+def interactive_menu():
     while True:
         print('\n---[ Tower Networking Inc Alias Modifier ]---')
         print('[1] View current alias (Plain Text)')
-        print('[2] Dump current alias (Base64 for sharing)')
-        print('[3] Load a Base64 string')
+        print('[2] Dump current alias (share string)')
+        print('[3] Load a share string')
         print('[4] Load from library')
         print('[5] Pull libraries from Github')
+        print('[6] History / undo an import')
+        print('[7] Find & replace in all aliases')
         print('[Q] Quit')
 
         user_input = get_user_input()
@@ -188,8 +722,15 @@ def main():
             load_library()
         elif user_input == '5':
             pull_new_files()
+        elif user_input == '6':
+            show_history()
+        elif user_input == '7':
+            find_and_replace()
         elif user_input.lower() in ['', 'q']:
             break
 
 if __name__ == '__main__':
-    main()
+    import multiprocessing
+    # Library decode workers re-run this file in frozen builds; this keeps them out of the menu
+    multiprocessing.freeze_support()
+    sys.exit(main())